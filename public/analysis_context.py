@@ -0,0 +1,59 @@
+import nlp
+
+
+class AnalysisContext:
+    """Per-message analysis state, each part computed at most once.
+
+    Sentiment, the sentence embedding and the preprocessed text are derived
+    lazily on first access and then shared by symptom scoring, severity
+    assessment and disorder analysis for the same message.
+    """
+
+    def __init__(self, text, sentiment=None, embedding=None):
+        if not text or not isinstance(text, str):
+            raise ValueError("Input text must be a non-empty string")
+        self.text = text
+        self._sentiment = sentiment
+        self._embedding = embedding
+        self._processed_text = None
+
+    @classmethod
+    def many(cls, texts, batch_size=None):
+        """Build contexts for many texts, encoding all of them in one batched call."""
+        contexts = [cls(text) for text in texts]
+        if contexts:
+            embeddings = nlp.encode_texts([context.text for context in contexts], batch_size=batch_size)
+            for context, embedding in zip(contexts, embeddings):
+                context._embedding = embedding
+        return contexts
+
+    @property
+    def sentiment(self):
+        if self._sentiment is None:
+            self._sentiment = nlp.analyze_sentiment(self.text)
+        return self._sentiment
+
+    @property
+    def embedding(self):
+        if self._embedding is None:
+            self._embedding = nlp.encode_texts([self.text])[0]
+        return self._embedding
+
+    @property
+    def processed_text(self):
+        if self._processed_text is None:
+            self._processed_text = nlp.preprocess_text(self.text)
+        return self._processed_text
+
+    @property
+    def tokens(self):
+        return self.processed_text.split()
+
+
+def score_contexts(contexts):
+    """Symptom confidences for many contexts with one matrix multiply over their embeddings."""
+    return nlp.score_symptoms_batch(
+        [context.text for context in contexts],
+        sentiments=[context.sentiment for context in contexts],
+        embeddings=[context.embedding for context in contexts]
+    )
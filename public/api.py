@@ -1,25 +1,143 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hashlib
+import json
+import threading
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
 from typing import Dict, List, Optional
-from nlp import analyze_sentiment, calculate_confidence_score, assess_severity, disorders, symptom_expressions
+from nlp import analyze_sentiment, score_long_text, current_encode_scheduler, loaded_embedding_store, get_disorder_kernel, assess_severity, nearest_expressions, get_recommendation_index, encoder_id, catalogue_version, on_catalogue_change, invalidate_catalogue
+from analysis_context import AnalysisContext, score_contexts
+from response_cache import ResponseCache, cache_key
+from inference_executor import InferenceExecutor, ExecutorSaturatedError, InferenceTimeoutError
+from chunking import POOLING_METHODS
+from conversation_state import SessionStore
+from streaming import NDJSONStreamingResponse, iter_ndjson, ndjson_line
+from starlette.requests import ClientDisconnect
+import components
+import config
+import metrics
+import tracing
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
 
+inference_executor = InferenceExecutor(
+    max_workers=config.INFERENCE_WORKERS,
+    max_pending=config.INFERENCE_MAX_PENDING,
+    timeout=config.INFERENCE_TIMEOUT
+)
+
+response_cache = ResponseCache(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL) if config.RESPONSE_CACHE_ENABLED else None
+if response_cache is not None:
+    on_catalogue_change(response_cache.invalidate)
+
+# Per-conversation running analysis state for multi-turn chat
+session_store = SessionStore(config.SESSION_MAX, config.SESSION_TTL)
+
+# Serialised knowledge-graph responses, keyed by request path and snapshot fingerprint
+kg_response_cache = ResponseCache(config.RESPONSE_CACHE_SIZE, config.KG_CACHE_MAX_AGE)
+on_catalogue_change(kg_response_cache.invalidate)
+
+# Clients allowed to request debug traces, run the profiler and invalidate the catalogue
+trusted_networks = tracing.parse_networks(config.TRUSTED_NETWORKS)
+# Set by serve.py in prefork workers to pass a catalogue invalidation on to the other workers
+notify_workers = None
+profiler = tracing.SamplingProfiler()
+
+# Components /analyze needs before the pod should receive traffic, in load order
+REQUIRED_COMPONENTS = ['sentiment_analyzer', 'sentence_model', 'symptom_index', 'disorder_kernel']
+
+@app.on_event("startup")
+def warm_up_models():
+    # Load models and the symptom index without blocking startup (unless configured to)
+    if config.WARMUP_MODE == 'eager':
+        components.warmup(REQUIRED_COMPONENTS)
+    elif config.WARMUP_MODE == 'background':
+        threading.Thread(target=components.warmup, args=(REQUIRED_COMPONENTS,), name='warmup', daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_inference_executor():
+    inference_executor.shutdown(wait=False)
+
+# Collectors only read state that already exists: a scrape never starts the
+# encode scheduler or opens the embedding store. They are registered
+# separately so one failing collector does not drop the others' metrics.
+def collect_executor_metrics():
+    return [
+        ('hdw_inference_pending', 'gauge', 'Inference jobs running or queued on the executor.', [({}, inference_executor.pending)]),
+        ('hdw_inference_max_pending', 'gauge', 'Inference jobs accepted before requests get 503.', [({}, inference_executor.max_pending)])
+    ]
+
+def collect_encoder_metrics():
+    scheduler = current_encode_scheduler()
+    if scheduler is None:
+        return []
+    stats = scheduler.stats()
+    return [
+        ('hdw_encode_queue_depth', 'gauge', 'Encode requests waiting for the micro-batching scheduler.', [({}, stats['queue_depth'])]),
+        ('hdw_encode_batches_total', 'counter', 'Forward passes run by the encode scheduler.', [({}, stats['batches'])]),
+        ('hdw_encode_items_total', 'counter', 'Texts encoded by the encode scheduler.', [({}, stats['items'])])
+    ]
+
+def collect_cache_metrics():
+    caches = {'response': response_cache, 'kg_response': kg_response_cache, 'embedding': loaded_embedding_store()}
+    cache_stats = {name: cache.stats() for name, cache in caches.items() if cache is not None}
+    return [
+        ('hdw_cache_hits_total', 'counter', 'Cache lookups that found an entry.', [({'cache': name}, stats['hits']) for name, stats in cache_stats.items()]),
+        ('hdw_cache_misses_total', 'counter', 'Cache lookups that missed.', [({'cache': name}, stats['misses']) for name, stats in cache_stats.items()]),
+        ('hdw_cache_hit_ratio', 'gauge', 'Share of cache lookups that hit since startup.', [({'cache': name}, stats['hit_rate']) for name, stats in cache_stats.items()])
+    ]
+
+def collect_component_metrics():
+    status = components.component_status()
+    return [
+        ('hdw_component_loaded', 'gauge', 'Whether a model or index is loaded (1) or not (0).', [({'component': name}, int(entry['state'] == 'loaded')) for name, entry in status.items()]),
+        ('hdw_component_failed', 'gauge', 'Whether the last load of a model or index failed.', [({'component': name}, int(entry['state'] == 'failed')) for name, entry in status.items()]),
+        ('hdw_component_load_seconds', 'gauge', 'Time the last successful load took.', [({'component': name}, entry['load_seconds']) for name, entry in status.items() if 'load_seconds' in entry])
+    ]
+
+def collect_session_metrics():
+    sessions = session_store.stats()
+    return [('hdw_sessions_active', 'gauge', 'Live conversation sessions.', [({}, sessions['active'])])]
+
+for collector in (collect_executor_metrics, collect_encoder_metrics, collect_cache_metrics, collect_component_metrics, collect_session_metrics):
+    metrics.add_collector(collector)
+app.add_middleware(metrics.RequestMetricsMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:8080"],  # Frontend development server
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "Accept-Language", "Content-Length", "X-Requested-With"],
-    expose_headers=["Content-Type", "Authorization", "Content-Length"],
+    allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "Accept-Language", "Content-Length", "X-Requested-With", "If-None-Match"],
+    expose_headers=["Content-Type", "Authorization", "Content-Length", "ETag"],
     max_age=3600
 )
 
 class MessageInput(BaseModel):
     text: str
 
+class BatchMessageInput(BaseModel):
+    messages: List[MessageInput]
+    batch_size: Optional[int] = None
+
+class LongMessageInput(BaseModel):
+    text: str
+    pooling: str = 'max'
+    top_k: int = 3
+
+class SimilarExpressionsInput(BaseModel):
+    text: str
+    k: int = 5
+
+class SimilarExpression(BaseModel):
+    symptom: str
+    expression: str
+    similarity: float
+
 class ConfidenceScore(BaseModel):
     overall_confidence: float
     semantic_similarity: float
@@ -47,46 +165,320 @@ class NLPResponse(BaseModel):
     severity_assessment: Optional[SeverityAssessment]
     confidence_scores: Dict[str, float]
 
-@app.post("/analyze", response_model=NLPResponse)
-async def analyze_message(message: MessageInput):
-    if not message.text.strip():
+class TraceStage(BaseModel):
+    stage: str
+    start_ms: float
+    duration_ms: float
+
+class StageTotal(BaseModel):
+    calls: int
+    total_ms: float
+
+class DebugTrace(BaseModel):
+    total_ms: float
+    stages: List[TraceStage]
+    stage_totals: Dict[str, StageTotal]
+    counters: Dict[str, int]
+
+class TracedNLPResponse(NLPResponse):
+    debug: DebugTrace
+
+class EvidenceSpan(BaseModel):
+    start: int
+    end: int
+    text: str
+    confidence: float
+
+class LongNLPResponse(NLPResponse):
+    evidence: Dict[str, List[EvidenceSpan]]
+    chunks: int
+
+class SessionSymptom(BaseModel):
+    symptom: str
+    max_confidence: Optional[float]
+    turn_count: int
+    first_turn: int
+    last_turn: int
+
+class SentimentTrend(BaseModel):
+    mean: float
+    ema: float
+    recent: List[float]
+
+class SessionState(BaseModel):
+    session_id: str
+    turns: int
+    symptoms: List[SessionSymptom]
+    sentiment_trend: SentimentTrend
+    disorder_scores: Dict[str, float]
+
+class SessionTurnResponse(BaseModel):
+    turn: NLPResponse
+    state: SessionState
+
+def validate_message_text(text):
+    if not text.strip():
         raise HTTPException(status_code=400, detail="Message text cannot be empty")
 
-    if len(message.text) > 5000:
-        raise HTTPException(status_code=400, detail="Message text is too long. Maximum length is 5000 characters")
+    if len(text) > config.MAX_MESSAGE_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Message text is too long. Maximum length is {config.MAX_MESSAGE_LENGTH} characters")
+
+def is_trusted_client(request):
+    return request.client is not None and tracing.is_trusted(request.client.host, trusted_networks)
+
+def trace_requested(request):
+    """Whether this request asked for a debug trace and may have one."""
+    if request.headers.get(config.DEBUG_TRACE_HEADER, '').strip().lower() not in ('1', 'true', 'yes', 'on'):
+        return False
+    return config.DEBUG_TRACE_ENABLED and is_trusted_client(request)
+
+@metrics.timed('build_response')
+def build_response(sentiment_analysis, symptom_confidences):
+    """Turn per-symptom confidences for one message into an NLPResponse."""
+    kernel = get_disorder_kernel()
+    detected_symptoms = []
+    for symptom, confidence in symptom_confidences.items():
+        if confidence['overall_confidence'] > 0.3:  # Confidence threshold
+            for disorder in kernel.disorders_for(symptom):
+                detected_symptoms.append({
+                    'symptom': symptom,
+                    'disorder': disorder,
+                    'confidence': confidence
+                })
+
+    # Assess severity if symptoms were detected
+    severity = None
+    if detected_symptoms:
+        severity = assess_severity({
+            'confidence': max([s['confidence']['overall_confidence'] for s in detected_symptoms]),
+            'sentiment': sentiment_analysis
+        })
+
+    return NLPResponse(
+        sentiment=sentiment_analysis,
+        detected_symptoms=detected_symptoms,
+        severity_assessment=severity,
+        confidence_scores={'max_confidence': max([s['confidence']['overall_confidence'] for s in detected_symptoms]) if detected_symptoms else 0}
+    )
+
+def analyze_text(text):
+    """Run the full blocking analysis pipeline for one message."""
+    # Sentiment and embedding are computed once and shared by every stage
+    with metrics.stage('analyze'):
+        context = AnalysisContext(text)
+        symptom_confidences = score_contexts([context])[0]
+        return build_response(context.sentiment, symptom_confidences)
+
+def analyze_long_text(text, pooling, top_k):
+    """Run the chunked pipeline for one long document."""
+    symptom_confidences, evidence, chunks = score_long_text(text, pooling=pooling, top_k=top_k)
+    response = build_response(analyze_sentiment(text), symptom_confidences)
+    return LongNLPResponse(**response.dict(), evidence=evidence, chunks=chunks)
+
+def analyze_session_turn(state, text):
+    """Fold one message into a conversation state; the caller holds ``state.lock``."""
+    context = AnalysisContext(text)
+    symptom_confidences = state.add_turn(text, context)
+    return SessionTurnResponse(turn=build_response(context.sentiment, symptom_confidences), state=state.snapshot)
+
+async def run_session_turn(state, text):
+    """Run one turn on the executor; a turn sent while another one of the session runs gets 409."""
+    if not state.lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="The previous message of this session is still being analyzed")
+    # The session lock is released by whoever takes ``claim`` first: the turn
+    # once it starts (even after a 504), or this coroutine if it never runs
+    claim = threading.Lock()
+
+    def turn():
+        if not claim.acquire(blocking=False):
+            return None
+        try:
+            return analyze_session_turn(state, text)
+        finally:
+            state.lock.release()
 
     try:
-        # Analyze sentiment
-        sentiment_analysis = analyze_sentiment(message.text)
-        
-        # Detect symptoms
-        detected_symptoms = []
-        for symptom, expressions in symptom_expressions.items():
-            confidence = calculate_confidence_score(message.text, " ".join(expressions))
-            if confidence['overall_confidence'] > 0.3:  # Confidence threshold
-                for disorder, symptoms in disorders.items():
-                    if symptom in symptoms:
-                        detected_symptoms.append({
-                            'symptom': symptom,
-                            'disorder': disorder,
-                            'confidence': confidence
-                        })
-        
-        # Assess severity if symptoms were detected
-        severity = None
-        if detected_symptoms:
-            severity = assess_severity({
-                'confidence': max([s['confidence']['overall_confidence'] for s in detected_symptoms]),
-                'sentiment': sentiment_analysis
-            })
-        
-        return NLPResponse(
-            sentiment=sentiment_analysis,
-            detected_symptoms=detected_symptoms,
-            severity_assessment=severity,
-            confidence_scores={'max_confidence': max([s['confidence']['overall_confidence'] for s in detected_symptoms]) if detected_symptoms else 0}
-        )
+        return await run_inference(turn)
+    finally:
+        if claim.acquire(blocking=False):
+            state.lock.release()
+
+def analyze_texts(texts, batch_size):
+    """Run the blocking analysis pipeline for many messages at once."""
+    contexts = AnalysisContext.many(texts, batch_size=batch_size)
+    return [
+        build_response(context.sentiment, symptom_confidences)
+        for context, symptom_confidences in zip(contexts, score_contexts(contexts))
+    ]
+
+def response_cache_key(text):
+    return cache_key(text, encoder_id(), catalogue_version())
+
+def etag_matches(request, etag):
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def kg_response(request, build):
+    """Serve a read-only knowledge-graph response with an ETag, answering 304 when it is unchanged.
+
+    ``build`` returns the JSON-serialisable body, or None for a 404. Bodies
+    are cached per request URL and snapshot fingerprint.
+    """
+    index = get_recommendation_index()
+    key = cache_key(str(request.url.path) + '?' + str(request.url.query), index.fingerprint)
+    cached = kg_response_cache.get(key)
+    if cached is None:
+        content = build(index)
+        if content is None:
+            raise HTTPException(status_code=404, detail="Not found in the knowledge graph")
+        body = json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        cached = (body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"')
+        kg_response_cache.put(key, cached)
+
+    body, etag = cached
+    headers = {'ETag': etag, 'Cache-Control': f"public, max-age={config.KG_CACHE_MAX_AGE}"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+async def run_inference(fn, *args):
+    """Run blocking inference on the executor, mapping overload and timeouts to HTTP errors."""
+    try:
+        return await inference_executor.run(fn, *args)
+    except ExecutorSaturatedError:
+        raise HTTPException(status_code=503, detail="The service is busy. Please try again shortly.", headers={"Retry-After": "1"})
+    except InferenceTimeoutError:
+        raise HTTPException(status_code=504, detail="Analysis took too long. Please try again later.")
+
+@app.get("/health")
+async def health():
+    return {'status': 'ok', 'pending_inference': inference_executor.pending}
+
+@app.get("/ready")
+async def ready():
+    status = components.component_status()
+    is_ready = all(status[name]['state'] == 'loaded' for name in REQUIRED_COMPONENTS)
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={'ready': is_ready, 'components': status}
+    )
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    if not metrics.registry.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+@app.post("/admin/profile")
+async def profile_live_traffic(request: Request, seconds: float = 10.0, interval_ms: float = 10.0):
+    """Sample every thread's stack for ``seconds`` and return flamegraph-compatible collapsed stacks."""
+    if not config.DEBUG_TRACE_ENABLED or not is_trusted_client(request):
+        raise HTTPException(status_code=403, detail="Profiling is only available to trusted clients")
+    if not 0 < seconds <= config.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be between 0 and {config.PROFILE_MAX_SECONDS}")
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+
+    counts = await asyncio.get_event_loop().run_in_executor(None, profiler.profile, seconds, interval_ms / 1000)
+    if counts is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return PlainTextResponse(
+        tracing.collapsed_stacks(counts),
+        headers={'Content-Disposition': 'attachment; filename="profile.collapsed"'}
+    )
+
+@app.get("/stats/encoder")
+async def encoder_stats():
+    if not config.ENCODE_SCHEDULER_ENABLED:
+        return {'enabled': False}
+    # Like /metrics, polling stats must not start the scheduler thread
+    scheduler = current_encode_scheduler()
+    if scheduler is None:
+        return {'enabled': True, 'running': False}
+    return {'enabled': True, 'running': True, **scheduler.stats()}
+
+@app.get("/stats/embeddings")
+async def embedding_cache_stats():
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return {'enabled': False}
+    # Like /metrics, polling stats must not open the SQLite store
+    store = loaded_embedding_store()
+    if store is None:
+        return {'enabled': True, 'running': False}
+    return {'enabled': True, 'running': True, **store.stats()}
+
+@app.get("/stats/cache")
+async def cache_stats():
+    if response_cache is None:
+        return {'enabled': False}
+    return {'enabled': True, 'catalogue_version': catalogue_version(), **response_cache.stats()}
+
+@app.get("/kg/disorders")
+async def kg_disorders(request: Request):
+    return kg_response(request, lambda index: {'disorders': index.disorders()})
+
+@app.get("/kg/disorders/{disorder}")
+async def kg_disorder(disorder: str, request: Request):
+    return kg_response(request, lambda index: index.profile(disorder))
+
+@app.get("/kg/disorders/{disorder}/treatments")
+async def kg_disorder_treatments(disorder: str, request: Request):
+    def build(index):
+        profile = index.profile(disorder)
+        if profile is None:
+            return None
+        return {'disorder': profile['disorder'], 'therapies': profile['therapies'], 'treatments': profile['treatments']}
+    return kg_response(request, build)
+
+@app.get("/kg/symptoms/{symptom}/disorders")
+async def kg_symptom_disorders(symptom: str, request: Request):
+    def build(index):
+        disorders = index.disorders_for_symptom(symptom)
+        return {'symptom': symptom, 'disorders': disorders} if disorders else None
+    return kg_response(request, build)
+
+@app.get("/kg/recommendations")
+async def kg_recommendations(request: Request, symptoms: List[str] = Query(...), limit: int = 5):
+    if not 1 <= limit <= config.MAX_RECOMMENDATIONS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {config.MAX_RECOMMENDATIONS}")
+    return kg_response(request, lambda index: index.recommend(symptoms, limit))
+
+@app.post("/catalogue/invalidate")
+async def invalidate_catalogue_caches(request: Request):
+    # Rebuilding every catalogue index is expensive, so only trusted clients may trigger it
+    if not is_trusted_client(request):
+        raise HTTPException(status_code=403, detail="Catalogue invalidation is only available to trusted clients")
+    # Rebuild catalogue-derived indexes and drop cached responses after a catalogue edit
+    await run_inference(invalidate_catalogue)
+    if notify_workers is not None:
+        notify_workers()
+    return {'catalogue_version': catalogue_version()}
+
+@app.post("/analyze", response_model=NLPResponse)
+async def analyze_message(message: MessageInput, request: Request):
+    validate_message_text(message.text)
+
+    # Traced requests skip the response cache so the trace shows the full pipeline
+    trace, token = tracing.start_trace() if trace_requested(request) else (None, None)
+    key = response_cache_key(message.text) if response_cache is not None and trace is None else None
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    try:
+        result = await run_inference(analyze_text, message.text)
+        if key is not None:
+            response_cache.put(key, result)
+        if trace is not None:
+            return JSONResponse(content=jsonable_encoder(TracedNLPResponse(**result.dict(), debug=trace.summary())))
+        return result
     
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -96,6 +488,254 @@ async def analyze_message(message: MessageInput):
             status_code=500,
             detail="An error occurred while processing your message. Please try again later."
         )
+    finally:
+        if token is not None:
+            tracing.end_trace(token)
+
+@app.post("/analyze_long", response_model=LongNLPResponse)
+async def analyze_long_message(message: LongMessageInput):
+    if not message.text.strip():
+        raise HTTPException(status_code=400, detail="Message text cannot be empty")
+    if len(message.text) > config.MAX_LONG_MESSAGE_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Message text is too long. Maximum length is {config.MAX_LONG_MESSAGE_LENGTH} characters")
+    if message.pooling not in POOLING_METHODS:
+        raise HTTPException(status_code=400, detail=f"pooling must be one of: {', '.join(POOLING_METHODS)}")
+    if message.top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be a positive integer")
+
+    key = cache_key(message.text, encoder_id(), catalogue_version(), 'long', message.pooling, str(message.top_k)) if response_cache is not None else None
+    if key is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    try:
+        result = await run_inference(analyze_long_text, message.text, message.pooling, message.top_k)
+        if key is not None:
+            response_cache.put(key, result)
+        return result
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error processing long message: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while processing your message. Please try again later."
+        )
+
+def require_sessions():
+    if not config.SESSIONS_ENABLED:
+        raise HTTPException(status_code=404, detail="Sessions are disabled")
+
+def get_session_or_404(session_id):
+    require_sessions()
+    state = session_store.get(session_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return state
+
+@app.post("/sessions", response_model=SessionState, status_code=201)
+async def create_session():
+    require_sessions()
+    return session_store.create().snapshot
+
+@app.get("/sessions/{session_id}", response_model=SessionState)
+async def get_session(session_id: str):
+    return get_session_or_404(session_id).snapshot
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    require_sessions()
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Unknown or expired session")
+    return Response(status_code=204)
+
+@app.post("/sessions/{session_id}/messages", response_model=SessionTurnResponse)
+async def add_session_message(session_id: str, message: MessageInput):
+    validate_message_text(message.text)
+    state = get_session_or_404(session_id)
+
+    try:
+        return await run_session_turn(state, message.text)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error processing session message: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while processing your message. Please try again later."
+        )
+
+@app.get("/stats/sessions")
+async def session_stats():
+    if not config.SESSIONS_ENABLED:
+        return {'enabled': False}
+    return {'enabled': True, **session_store.stats()}
+
+@app.post("/similar_expressions", response_model=List[SimilarExpression])
+async def similar_expressions(query: SimilarExpressionsInput):
+    validate_message_text(query.text)
+    if not 1 <= query.k <= config.MAX_SIMILAR_EXPRESSIONS:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {config.MAX_SIMILAR_EXPRESSIONS}")
+
+    try:
+        return (await run_inference(nearest_expressions, [query.text], query.k))[0]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error searching expressions: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while processing your message. Please try again later."
+        )
+
+@app.post("/analyze_batch", response_model=List[NLPResponse])
+async def analyze_batch(batch: BatchMessageInput):
+    if not batch.messages:
+        raise HTTPException(status_code=400, detail="At least one message is required")
+
+    if len(batch.messages) > config.MAX_BATCH_MESSAGES:
+        raise HTTPException(status_code=400, detail=f"Too many messages. Maximum batch size is {config.MAX_BATCH_MESSAGES} messages")
+
+    for i, message in enumerate(batch.messages):
+        try:
+            validate_message_text(message.text)
+        except HTTPException as e:
+            raise HTTPException(status_code=400, detail=f"Message {i}: {e.detail}")
+
+    batch_size = min(config.ENCODE_BATCH_SIZE if batch.batch_size is None else batch.batch_size, config.MAX_ENCODE_BATCH_SIZE)
+    if batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be a positive integer")
+
+    texts = [message.text for message in batch.messages]
+    keys = [response_cache_key(text) for text in texts] if response_cache is not None else [None] * len(texts)
+    results = [response_cache.get(key) if key is not None else None for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    try:
+        if missing:
+            computed = await run_inference(analyze_texts, [texts[i] for i in missing], batch_size)
+            for i, result in zip(missing, computed):
+                results[i] = result
+                if keys[i] is not None:
+                    response_cache.put(keys[i], result)
+        return results
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error processing batch: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while processing your messages. Please try again later."
+        )
+
+def parse_stream_entry(value):
+    """Return ``(id, text, error)`` for one decoded NDJSON line of /analyze_stream."""
+    if isinstance(value, Exception):
+        return None, None, str(value)
+    if isinstance(value, str):
+        entry_id, text = None, value
+    elif isinstance(value, dict):
+        entry_id, text = value.get('id'), value.get('text')
+    else:
+        return None, None, "Each line must be a JSON object with a 'text' field or a JSON string"
+    if not isinstance(text, str):
+        return entry_id, None, "'text' must be a string"
+    try:
+        validate_message_text(text)
+    except HTTPException as e:
+        return entry_id, None, e.detail
+    return entry_id, text, None
+
+async def analyze_stream_batch(entries):
+    """Analyze one bounded batch of ``(line, id, text)`` entries and return their NDJSON output."""
+    texts = [text for _, _, text in entries]
+    keys = [response_cache_key(text) for text in texts] if response_cache is not None else [None] * len(texts)
+    results = [response_cache.get(key) if key is not None else None for key in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+
+    error = None
+    if missing:
+        # Wait for a free executor slot rather than failing the rest of the stream with a 503
+        delay = 0.01
+        while True:
+            try:
+                computed = await inference_executor.run(analyze_texts, [texts[i] for i in missing], len(missing))
+                break
+            except ExecutorSaturatedError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+            except InferenceTimeoutError:
+                error = "Analysis took too long."
+                break
+            except Exception as e:
+                print(f"Error processing stream batch: {str(e)}")
+                error = "An error occurred while processing this entry."
+                break
+        if error is None:
+            for i, result in zip(missing, computed):
+                results[i] = result
+                if keys[i] is not None:
+                    response_cache.put(keys[i], result)
+
+    output = bytearray()
+    for (line_number, entry_id, _), result in zip(entries, results):
+        if result is None:
+            output += ndjson_line({'line': line_number, 'id': entry_id, 'error': error})
+        else:
+            output += ndjson_line({'line': line_number, 'id': entry_id, 'result': result.dict()})
+    return bytes(output), sum(result is None for result in results)
+
+@app.post("/analyze_stream")
+async def analyze_stream(request: Request):
+    """Analyze an NDJSON body of ``{"id": ..., "text": ...}`` lines, streaming NDJSON results back.
+
+    The body is read incrementally and analyzed in batches of at most
+    ``HDW_STREAM_BATCH_SIZE`` entries; the next part of the body is only read
+    once the previous batch has been written, so memory use does not grow
+    with the upload. Each output line carries the input line number and id
+    plus either ``result`` or ``error`` (invalid lines are reported as soon as
+    they are read, so output order may differ from input order); a final
+    ``done`` line reports totals.
+    """
+    async def results():
+        pending = []
+        processed = 0
+        errors = 0
+        try:
+            async for line_number, value in iter_ndjson(request.stream(), config.STREAM_MAX_LINE_BYTES):
+                entry_id, text, error = parse_stream_entry(value)
+                if error is not None:
+                    errors += 1
+                    yield ndjson_line({'line': line_number, 'id': entry_id, 'error': error})
+                    continue
+                pending.append((line_number, entry_id, text))
+                if len(pending) >= config.STREAM_BATCH_SIZE:
+                    output, failed = await analyze_stream_batch(pending)
+                    processed += len(pending) - failed
+                    errors += failed
+                    pending = []
+                    yield output
+            if pending:
+                output, failed = await analyze_stream_batch(pending)
+                processed += len(pending) - failed
+                errors += failed
+                yield output
+        except ClientDisconnect:
+            return
+        yield ndjson_line({'done': True, 'processed': processed, 'errors': errors})
+
+    return NDJSONStreamingResponse(results())
 
 if __name__ == "__main__":
     import uvicorn
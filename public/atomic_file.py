@@ -0,0 +1,25 @@
+import contextlib
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='wb', encoding=None):
+    """Open a temporary file next to ``path`` and move it over ``path`` on success.
+
+    The temporary name is unique, so processes rebuilding the same file at
+    once never write into each other's output, and readers only ever see a
+    complete file. On error the temporary file is removed.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
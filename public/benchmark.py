@@ -0,0 +1,269 @@
+"""Latency benchmarks for the NLP hot paths.
+
+Times the sentiment, confidence, preprocessing, splitting, symptom and
+disorder stages plus the full ``/analyze`` pipeline (on the inference
+executor, without the HTTP layer) on a synthetic English, French and Arabic
+message corpus (no user data, no network), and reports p50/p95/p99 latency
+and throughput per benchmark plus the peak RSS of the whole run. The RSS
+high-water mark only ever grows, so per benchmark the report shows how far
+it rose while that benchmark ran (0 if it stayed under an earlier peak).
+
+Record a baseline on the machine that runs the checks, then compare later
+runs against it; the command exits with status 1 when a benchmark's p50 or
+p95 latency grows by more than the threshold::
+
+    python benchmark.py --save-baseline
+    python benchmark.py --threshold 0.2
+    python benchmark.py --only analyze_sentiment smart_split --iterations 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+
+import numpy as np
+
+# Anonymised fragments in the style of real check-in messages
+CORPUS_FRAGMENTS = {
+    'en': {
+        'openers': ["Lately", "For the past few weeks", "Since last month", "Most days", "Honestly", "Today"],
+        'feelings': [
+            "I feel sad and empty", "I can't stop worrying about everything", "I have trouble sleeping",
+            "I feel exhausted even after resting", "my thoughts race at night", "I don't enjoy anything anymore",
+            "I get angry over small things", "I feel like nobody understands me", "my heart pounds for no reason",
+            "I keep having flashbacks", "I can't focus at work", "I barely eat"
+        ],
+        'links': ["and", "but", "also", "so", "because"],
+        'closers': [
+            "I don't know what to do.", "It is getting worse.", "Some days are better than others.",
+            "My family is worried about me.", "I just want to feel normal again."
+        ]
+    },
+    'fr': {
+        'openers': ["Ces derniers temps", "Depuis quelques semaines", "Depuis le mois dernier", "La plupart des jours"],
+        'feelings': [
+            "je me sens triste et vide", "je n'arrête pas de m'inquiéter", "j'ai du mal à dormir",
+            "je suis épuisé même après m'être reposé", "je ne prends plus plaisir à rien",
+            "je m'énerve pour des petites choses", "j'ai le cœur qui bat très fort sans raison"
+        ],
+        'links': ["et", "mais", "aussi", "alors", "parce que"],
+        'closers': ["Je ne sais plus quoi faire.", "Ça empire.", "Ma famille s'inquiète pour moi."]
+    },
+    'ar': {
+        'openers': ["في الآونة الأخيرة", "منذ بضعة أسابيع", "منذ الشهر الماضي", "معظم الأيام"],
+        'feelings': [
+            "أشعر بالحزن والفراغ", "لا أستطيع التوقف عن القلق", "لدي صعوبة في النوم",
+            "أشعر بالتعب حتى بعد الراحة", "لم أعد أستمتع بأي شيء", "أغضب بسبب أشياء صغيرة",
+            "قلبي يخفق بقوة بلا سبب"
+        ],
+        'links': ["و", "لكن", "أيضاً", "لذلك", "لأن"],
+        'closers': ["لا أعرف ماذا أفعل.", "الأمر يزداد سوءاً.", "عائلتي قلقة علي."]
+    }
+}
+
+# Share of each language in the corpus
+CORPUS_LANGUAGES = {'en': 0.6, 'fr': 0.2, 'ar': 0.2}
+
+BENCHMARKS = [
+    'analyze_sentiment', 'calculate_confidence_score', 'preprocess_text', 'smart_split',
+    'extract_symptoms', 'analyze_disorders', 'analyze'
+]
+
+
+def synthetic_corpus(size=200, seed=0):
+    """Deterministic mix of short and long messages in English, French and Arabic."""
+    rng = random.Random(seed)
+    languages = list(CORPUS_LANGUAGES)
+    weights = [CORPUS_LANGUAGES[lang] for lang in languages]
+    messages = []
+    for _ in range(size):
+        fragments = CORPUS_FRAGMENTS[rng.choices(languages, weights)[0]]
+        parts = [rng.choice(fragments['openers']) + " " + rng.choice(fragments['feelings'])]
+        # Mostly one to three clauses, occasionally a long rambling message
+        for _ in range(rng.choice([0, 1, 1, 2, 2, 3, 8])):
+            parts.append(rng.choice(fragments['links']) + " " + rng.choice(fragments['feelings']))
+        message = " ".join(parts)
+        if rng.random() < 0.5:
+            message += ". " + rng.choice(fragments['closers'])
+        messages.append(message)
+    return messages
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(fn, inputs, iterations=3, warmup=1):
+    """Call ``fn`` on every input ``iterations`` times and summarise the per-call latency."""
+    peak_before = peak_rss_mb()
+    for _ in range(warmup):
+        for value in inputs:
+            fn(value)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for value in inputs:
+            call_started = time.perf_counter()
+            fn(value)
+            latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'calls': len(latencies),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'throughput_per_s': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'peak_rss_growth_mb': peak_rss_mb() - peak_before
+    }
+
+
+def benchmark_functions():
+    """Benchmark name -> callable taking one corpus message."""
+    import api
+    import nlp
+
+    symptoms = nlp.get_all_symptoms_from_kg()
+    expressions = [expression for phrasings in nlp.symptom_expressions.values() for expression in phrasings]
+    detected = {}
+
+    def confidence(text):
+        return nlp.calculate_confidence_score(text, expressions[len(text) % len(expressions)])
+
+    def disorders(text):
+        if text not in detected:
+            detected[text] = nlp.extract_symptoms(text, symptoms)
+        return nlp.analyze_disorders(detected[text], [text])
+
+    loop = asyncio.new_event_loop()
+
+    def analyze(text):
+        # What /analyze runs for a cache miss: the full pipeline on the inference executor
+        return loop.run_until_complete(api.run_inference(api.analyze_text, text))
+
+    return {
+        'analyze_sentiment': nlp.analyze_sentiment,
+        'calculate_confidence_score': confidence,
+        'preprocess_text': nlp.preprocess_text,
+        'smart_split': nlp.smart_split,
+        'extract_symptoms': lambda text: nlp.extract_symptoms(text, symptoms),
+        'analyze_disorders': disorders,
+        'analyze': analyze
+    }
+
+
+def run(names, corpus, iterations=3, warmup=1):
+    """Run the named benchmarks; disable the response and embedding caches first or they time cache hits."""
+    functions = benchmark_functions()
+    results = {}
+    for name in names:
+        results[name] = measure(functions[name], corpus, iterations, warmup)
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'corpus_size': len(corpus),
+        'iterations': iterations,
+        'process_peak_rss_mb': peak_rss_mb(),
+        'benchmarks': results
+    }
+
+
+def compare(report, baseline, threshold=0.2):
+    """Regressions of ``report`` against ``baseline``: p50 or p95 latency more than ``threshold`` higher."""
+    regressions = []
+    for name, result in report['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if previous[metric] > 0 and result[metric] > previous[metric] * (1 + threshold):
+                regressions.append({
+                    'benchmark': name,
+                    'metric': metric,
+                    'baseline': previous[metric],
+                    'current': result[metric],
+                    'change': result[metric] / previous[metric] - 1
+                })
+    return regressions
+
+
+def format_report(report, baseline=None):
+    lines = [f"{'benchmark':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'calls/s':>10}{'peak +MiB':>11}{'p50 vs base':>13}"]
+    for name, result in report['benchmarks'].items():
+        previous = (baseline or {}).get('benchmarks', {}).get(name)
+        change = f"{result['p50_ms'] / previous['p50_ms'] - 1:+.1%}" if previous and previous['p50_ms'] > 0 else "-"
+        lines.append(
+            f"{name:<28}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            f"{result['throughput_per_s']:>10.1f}{result['peak_rss_growth_mb']:>11.0f}{change:>13}"
+        )
+    lines.append(f"process peak RSS: {report['process_peak_rss_mb']:.0f} MiB")
+    return "\n".join(lines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--corpus-size', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--baseline', default=None, help='baseline JSON (default: HDW_BENCHMARK_BASELINE_PATH)')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative latency increase')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--output', default=None, help='also write the report JSON here')
+    args = parser.parse_args(argv)
+
+    # The corpus is synthetic and models come from the local cache
+    os.environ.setdefault('HDW_OFFLINE', '1')
+    os.environ.setdefault('HDW_WARMUP', 'lazy')
+    # Time the pipeline itself, not cache hits on the repeated corpus (and keep it out of the caches)
+    os.environ['HDW_RESPONSE_CACHE'] = '0'
+    os.environ['HDW_EMBEDDING_CACHE'] = '0'
+    import config
+
+    baseline_path = args.baseline or config.BENCHMARK_BASELINE_PATH
+    report = run(args.only, synthetic_corpus(args.corpus_size, args.seed), args.iterations, args.warmup)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path) or '.', exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(format_report(report))
+        print(f"Saved baseline to {baseline_path}")
+        return 0
+
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+    if baseline is None:
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one")
+        return 0
+
+    regressions = compare(report, baseline, args.threshold)
+    for regression in regressions:
+        print(
+            f"REGRESSION: {regression['benchmark']} {regression['metric']} "
+            f"{regression['baseline']:.2f} -> {regression['current']:.2f} ms ({regression['change']:+.1%})"
+        )
+    if regressions:
+        return 1
+    print(f"OK: no benchmark is more than {args.threshold:.0%} slower than the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
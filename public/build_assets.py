@@ -0,0 +1,81 @@
+"""Build the precomputed NLP assets ahead of deployment.
+
+Run from the ``public`` directory, online or with pre-provisioned corpora::
+
+    python build_assets.py            # build everything
+    python build_assets.py lexicon    # build selected assets only
+
+Assets are written to the paths configured in ``config.py`` and are loaded
+by the service at startup instead of being rebuilt on the request path.
+"""
+import sys
+import time
+
+import config
+import nlp
+from symptom_index import SymptomIndex
+from translation import build_catalogue as build_translation_catalogue, save_catalogue as save_translation_catalogue
+from translation import create_backend as create_translation_backend
+
+
+def build_lexicon():
+    lexicon = nlp.SymptomLexicon.build(
+        nlp.catalogue_symptoms(),
+        nlp.get_symptom_variants,
+        nlp.lexicon_fingerprint(nlp.catalogue_symptoms(), nlp.CUSTOM_SYMPTOM_SYNONYMS)
+    )
+    lexicon.save(config.SYMPTOM_LEXICON_PATH)
+    return config.SYMPTOM_LEXICON_PATH
+
+
+def build_symptom_index():
+    index = SymptomIndex.build(nlp.symptom_expressions, nlp.encode_texts, nlp.encoder_id())
+    index.save(config.SYMPTOM_INDEX_PATH)
+    return config.SYMPTOM_INDEX_PATH
+
+
+def build_phrase_index():
+    nlp.phrase_index_component.reset()
+    nlp.get_phrase_index()
+    return config.PHRASE_INDEX_DIR
+
+
+def build_translations():
+    catalogue = build_translation_catalogue(
+        nlp.catalogue_strings(),
+        config.TRANSLATION_LANGUAGES,
+        create_translation_backend(config.TRANSLATION_BUILD_BACKEND),
+        seed=nlp.catalogue_translation_seed()
+    )
+    save_translation_catalogue(catalogue, config.TRANSLATION_CATALOGUE_PATH)
+    return config.TRANSLATION_CATALOGUE_PATH
+
+
+def build_kg_snapshot():
+    kinds, edges, labels = nlp.kg_catalogue()
+    nlp.KnowledgeGraphSnapshot.build(kinds, edges, labels).save(config.KG_SNAPSHOT_PATH)
+    return config.KG_SNAPSHOT_PATH
+
+
+BUILDERS = {
+    'lexicon': build_lexicon,
+    'symptom_index': build_symptom_index,
+    'phrase_index': build_phrase_index,
+    'translations': build_translations,
+    'kg_snapshot': build_kg_snapshot
+}
+
+
+def main(names):
+    for name in names or list(BUILDERS):
+        if name not in BUILDERS:
+            print(f"Unknown asset '{name}'. Choose from: {', '.join(BUILDERS)}")
+            return 1
+        started = time.perf_counter()
+        path = BUILDERS[name]()
+        print(f"Built {name} -> {path} ({time.perf_counter() - started:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
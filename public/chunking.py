@@ -0,0 +1,63 @@
+import re
+
+import numpy as np
+
+# Sentence ends: terminal punctuation followed by whitespace, or line breaks
+_SENTENCE_END = re.compile(r"(?<=[.!?؟۔])\s+|\n+")
+
+POOLING_METHODS = ['max', 'topk']
+
+
+def split_spans(text, max_chars=400, min_chars=40):
+    """Split ``text`` into ``(start, end)`` character spans of roughly sentence size.
+
+    Sentences shorter than ``min_chars`` are merged with their neighbours,
+    and sentences longer than ``max_chars`` are cut at the last whitespace
+    before the limit, so every chunk stays within the encoder's token window.
+    Runs in one linear pass over the text.
+    """
+    sentences = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        sentences.append((start, match.start()))
+        start = match.end()
+    sentences.append((start, len(text)))
+
+    spans = []
+    for start, end in sentences:
+        # Trim surrounding whitespace without losing the original offsets
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        while end - start > max_chars:
+            cut = text.rfind(' ', start, start + max_chars)
+            cut = cut if cut > start else start + max_chars
+            spans.append((start, cut))
+            start = cut
+            while start < end and text[start].isspace():
+                start += 1
+        if end > start:
+            if spans and (end - start < min_chars or spans[-1][1] - spans[-1][0] < min_chars) \
+                    and end - spans[-1][0] <= max_chars:
+                spans[-1] = (spans[-1][0], end)
+            else:
+                spans.append((start, end))
+    return spans
+
+
+def pool_scores(scores, method='max', k=3):
+    """Pool a (chunks x symptoms) score matrix into one score per symptom.
+
+    ``max`` keeps each symptom's best chunk; ``topk`` averages its ``k`` best
+    chunks, so a symptom mentioned repeatedly outranks a single passing hit.
+    Returns the pooled scores and, per symptom, chunk indices best first
+    (at most ``k``).
+    """
+    if method not in POOLING_METHODS:
+        raise ValueError(f"Unknown pooling method '{method}'. Choose from: {', '.join(POOLING_METHODS)}")
+    k = max(1, min(k, scores.shape[0]))
+    order = np.argsort(-scores, axis=0, kind='stable')[:k]
+    top = np.take_along_axis(scores, order, axis=0)
+    pooled = top[0] if method == 'max' else top.mean(axis=0)
+    return pooled, order.T
@@ -0,0 +1,86 @@
+import threading
+import time
+
+
+class LazyComponent:
+    """A heavy resource (model, corpus, index) that is loaded on first use.
+
+    Loading is guarded by a lock so concurrent callers share a single load,
+    and the load state is tracked for readiness reporting.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._value = None
+        self._state = 'not_loaded'
+        self._error = None
+        self._load_seconds = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._state == 'loaded'
+
+    def get(self):
+        """Return the component, loading it if necessary."""
+        if self._state == 'loaded':
+            return self._value
+        with self._lock:
+            if self._state != 'loaded':
+                self._state = 'loading'
+                started = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    self._state = 'failed'
+                    self._error = str(e)
+                    raise
+                self._load_seconds = time.perf_counter() - started
+                self._error = None
+                self._state = 'loaded'
+        return self._value
+
+    def reset(self):
+        """Drop the loaded value so the next ``get`` loads it again."""
+        with self._lock:
+            self._value = None
+            self._state = 'not_loaded'
+            self._error = None
+            self._load_seconds = None
+
+    def status(self):
+        status = {'state': self._state}
+        if self._load_seconds is not None:
+            status['load_seconds'] = round(self._load_seconds, 3)
+        if self._error:
+            status['error'] = self._error
+        return status
+
+
+_registry = {}
+
+
+def register(name, loader):
+    """Register a lazily loaded component and return it."""
+    component = LazyComponent(name, loader)
+    _registry[name] = component
+    return component
+
+
+def get_component(name):
+    return _registry[name]
+
+
+def component_status():
+    """Load state of every registered component."""
+    return {name: component.status() for name, component in _registry.items()}
+
+
+def warmup(names=None):
+    """Load the named components (all of them by default), logging failures."""
+    for name in names or list(_registry):
+        try:
+            _registry[name].get()
+        except Exception as e:
+            print(f"Failed to load component {name}: {e}")
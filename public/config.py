@@ -0,0 +1,154 @@
+import os
+
+# Runtime configuration for the NLP service, read from environment variables.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get('HDW_DATA_DIR', os.path.join(BASE_DIR, 'data'))
+
+
+def env_str(name, default=None):
+    """Read a string setting from the environment."""
+    value = os.environ.get(name)
+    return value if value not in (None, '') else default
+
+
+def env_int(name, default):
+    """Read an integer setting from the environment."""
+    value = env_str(name)
+    return int(value) if value is not None else default
+
+
+def env_float(name, default):
+    """Read a float setting from the environment."""
+    value = env_str(name)
+    return float(value) if value is not None else default
+
+
+def env_bool(name, default=False):
+    """Read a boolean setting from the environment (1/true/yes/on)."""
+    value = env_str(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Startup: never reach the network when offline; models and corpora must then
+# be pre-provisioned at the paths below.
+OFFLINE = env_bool('HDW_OFFLINE', False)
+NLTK_DATA_DIR = env_str('HDW_NLTK_DATA')
+MODEL_CACHE_DIR = env_str('HDW_MODEL_CACHE_DIR')
+# 'background' loads models in a warmup thread after startup, 'eager' blocks
+# startup until they are loaded and 'lazy' loads them on first request.
+WARMUP_MODE = env_str('HDW_WARMUP', 'background')
+
+# Sentence embedding model (a hub name or a local directory)
+SENTENCE_MODEL_NAME = env_str('HDW_SENTENCE_MODEL', 'all-MiniLM-L6-v2')
+ENCODE_BATCH_SIZE = env_int('HDW_ENCODE_BATCH_SIZE', 32)
+MAX_ENCODE_BATCH_SIZE = env_int('HDW_MAX_ENCODE_BATCH_SIZE', 256)
+
+# Encoder backend: 'torch' (fp32 reference), 'torch-int8' (dynamically
+# quantized) or 'onnx' (ONNX Runtime export at HDW_ONNX_MODEL_PATH)
+ENCODER_BACKEND = env_str('HDW_ENCODER_BACKEND', 'torch')
+ONNX_MODEL_PATH = env_str('HDW_ONNX_MODEL_PATH')
+ONNX_THREADS = env_int('HDW_ONNX_THREADS', 0) or None
+
+# spaCy pipeline (a package name or a local directory)
+SPACY_MODEL = env_str('HDW_SPACY_MODEL', 'en_core_web_sm')
+
+# Maximum number of memoized spell corrections
+SPELL_CACHE_SIZE = env_int('HDW_SPELL_CACHE_SIZE', 50000)
+
+# Micro-batching of concurrent encode calls
+ENCODE_SCHEDULER_ENABLED = env_bool('HDW_ENCODE_SCHEDULER', True)
+ENCODE_SCHEDULER_MAX_BATCH = env_int('HDW_ENCODE_SCHEDULER_MAX_BATCH', 32)
+ENCODE_SCHEDULER_MAX_WAIT_MS = env_float('HDW_ENCODE_SCHEDULER_MAX_WAIT_MS', 5.0)
+
+# Request limits
+MAX_MESSAGE_LENGTH = env_int('HDW_MAX_MESSAGE_LENGTH', 5000)
+MAX_BATCH_MESSAGES = env_int('HDW_MAX_BATCH_MESSAGES', 1000)
+MAX_SIMILAR_EXPRESSIONS = env_int('HDW_MAX_SIMILAR_EXPRESSIONS', 50)
+
+# /analyze_long: chunk size bounds (characters) and the longest accepted document
+CHUNK_MAX_CHARS = env_int('HDW_CHUNK_MAX_CHARS', 400)
+CHUNK_MIN_CHARS = env_int('HDW_CHUNK_MIN_CHARS', 40)
+MAX_LONG_MESSAGE_LENGTH = env_int('HDW_MAX_LONG_MESSAGE_LENGTH', 200000)
+
+# Conversation sessions (/sessions): maximum live sessions and idle expiry.
+# Sessions live in the memory of one process, so serve.py only runs several
+# workers with HDW_SESSIONS=0 (the /sessions endpoints then answer 404)
+SESSIONS_ENABLED = env_bool('HDW_SESSIONS', True)
+SESSION_MAX = env_int('HDW_SESSION_MAX', 10000)
+SESSION_TTL = env_float('HDW_SESSION_TTL', 1800.0)
+
+# /analyze_stream: entries analyzed per batch and the largest accepted NDJSON line
+STREAM_BATCH_SIZE = env_int('HDW_STREAM_BATCH_SIZE', 32)
+STREAM_MAX_LINE_BYTES = env_int('HDW_STREAM_MAX_LINE_BYTES', 65536)
+
+# Inference executor (keeps blocking model calls off the event loop)
+INFERENCE_WORKERS = env_int('HDW_INFERENCE_WORKERS', min(4, os.cpu_count() or 1))
+INFERENCE_MAX_PENDING = env_int('HDW_INFERENCE_MAX_PENDING', 64)
+INFERENCE_TIMEOUT = env_float('HDW_INFERENCE_TIMEOUT', 30.0) or None
+
+# Persistent embedding cache shared by workers on one host
+EMBEDDING_CACHE_ENABLED = env_bool('HDW_EMBEDDING_CACHE', True)
+EMBEDDING_CACHE_PATH = env_str('HDW_EMBEDDING_CACHE_PATH', os.path.join(DATA_DIR, 'embeddings.sqlite3'))
+EMBEDDING_CACHE_SIZE = env_int('HDW_EMBEDDING_CACHE_SIZE', 100000)
+
+# Response cache for repeated /analyze inputs
+RESPONSE_CACHE_ENABLED = env_bool('HDW_RESPONSE_CACHE', True)
+RESPONSE_CACHE_SIZE = env_int('HDW_RESPONSE_CACHE_SIZE', 10000)
+RESPONSE_CACHE_TTL = env_float('HDW_RESPONSE_CACHE_TTL', 300.0)
+
+# Prometheus metrics on /metrics; when off, stage timers are not even wrapped around the pipeline
+METRICS_ENABLED = env_bool('HDW_METRICS', True)
+# Per-request stage traces (X-Debug-Trace: 1) and the /admin/profile sampling
+# profiler; like /catalogue/invalidate, they are only available to clients in
+# HDW_TRUSTED_NETWORKS (addresses or CIDR ranges)
+DEBUG_TRACE_ENABLED = env_bool('HDW_DEBUG_TRACE', True)
+DEBUG_TRACE_HEADER = env_str('HDW_DEBUG_TRACE_HEADER', 'X-Debug-Trace')
+TRUSTED_NETWORKS = env_str('HDW_TRUSTED_NETWORKS', '127.0.0.1,::1')
+PROFILE_MAX_SECONDS = env_float('HDW_PROFILE_MAX_SECONDS', 60.0)
+
+# Precomputed symptom embedding index
+SYMPTOM_INDEX_PATH = env_str('HDW_SYMPTOM_INDEX_PATH', os.path.join(DATA_DIR, 'symptom_index.npz'))
+
+# Top-k phrase retrieval: 'flat' (exact), 'ivf' (approximate) or 'auto'
+# (ivf once the expression bank exceeds PHRASE_INDEX_IVF_THRESHOLD phrasings)
+PHRASE_INDEX_KIND = env_str('HDW_PHRASE_INDEX', 'auto')
+PHRASE_INDEX_IVF_THRESHOLD = env_int('HDW_PHRASE_INDEX_IVF_THRESHOLD', 20000)
+PHRASE_INDEX_PROBE = env_int('HDW_PHRASE_INDEX_PROBE', 16)
+PHRASE_INDEX_DIR = env_str('HDW_PHRASE_INDEX_DIR', DATA_DIR)
+
+# Fuzzy matching reads at most this many characters of a message (scores stay normalised by the full length)
+FUZZY_MAX_QUERY_CHARS = env_int('HDW_FUZZY_MAX_QUERY_CHARS', 2000)
+
+# Compiled symptom-variant lexicon (WordNet + custom synonyms)
+SYMPTOM_LEXICON_PATH = env_str('HDW_SYMPTOM_LEXICON_PATH', os.path.join(DATA_DIR, 'symptom_lexicon.json'))
+
+# Compiled knowledge-graph snapshot (integer-id adjacency arrays)
+KG_SNAPSHOT_PATH = env_str('HDW_KG_SNAPSHOT_PATH', os.path.join(DATA_DIR, 'kg_snapshot.npz'))
+# Cache-Control max-age for the read-only knowledge-graph endpoints
+KG_CACHE_MAX_AGE = env_int('HDW_KG_CACHE_MAX_AGE', 3600)
+MAX_RECOMMENDATIONS = env_int('HDW_MAX_RECOMMENDATIONS', 20)
+
+# Translation of user-facing text: 'identity' (local stand-in, no translation
+# beyond the pre-built catalogue), 'marian' (local MarianMT models) or
+# 'googletrans' (online; intended for building the catalogue only)
+TRANSLATION_BACKEND = env_str('HDW_TRANSLATION_BACKEND', 'identity')
+TRANSLATION_BUILD_BACKEND = env_str('HDW_TRANSLATION_BUILD_BACKEND', 'googletrans')
+TRANSLATION_LANGUAGES = env_str('HDW_TRANSLATION_LANGUAGES', 'ar,fr').split(',')
+TRANSLATION_CATALOGUE_PATH = env_str('HDW_TRANSLATION_CATALOGUE_PATH', os.path.join(DATA_DIR, 'translations.json'))
+TRANSLATION_CACHE_PATH = env_str('HDW_TRANSLATION_CACHE_PATH', os.path.join(DATA_DIR, 'translations.sqlite3'))
+TRANSLATION_CACHE_SIZE = env_int('HDW_TRANSLATION_CACHE_SIZE', 50000)
+
+# Stored latency baseline for benchmark.py
+BENCHMARK_BASELINE_PATH = env_str('HDW_BENCHMARK_BASELINE_PATH', os.path.join(DATA_DIR, 'benchmark_baseline.json'))
+
+# Prefork server (serve.py): models load once in the parent and are shared by the workers
+SERVE_HOST = env_str('HDW_SERVE_HOST', '0.0.0.0')
+SERVE_PORT = env_int('HDW_SERVE_PORT', 8000)
+SERVE_WORKERS = env_int('HDW_SERVE_WORKERS', 1 if SESSIONS_ENABLED else os.cpu_count() or 1)
+# Torch intra-op threads per worker; 0 divides the cores between the workers
+SERVE_TORCH_THREADS = env_int('HDW_SERVE_TORCH_THREADS', 0)
+SERVE_MEMORY_REPORT_INTERVAL = env_float('HDW_SERVE_MEMORY_REPORT_INTERVAL', 300.0)
+SERVE_LOG_LEVEL = env_str('HDW_SERVE_LOG_LEVEL', 'info')
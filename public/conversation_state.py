@@ -0,0 +1,170 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import nlp
+from analysis_context import AnalysisContext, score_contexts
+from disorder_kernel import symptom_key
+
+# Smoothing factor of the sentiment trend's exponential moving average
+SENTIMENT_EMA_ALPHA = 0.3
+
+
+class ConversationState:
+    """Running analysis of one multi-turn conversation.
+
+    Each call to :meth:`add_turn` analyzes only the new message (one
+    embedding, one sentiment pass, one symptom extraction) and folds it into
+    the accumulated state, so the cost of a turn does not grow with the
+    length of the conversation. Symptom evidence keeps, per symptom, the best
+    confidence seen, how many turns detected it and the first and last of
+    them; disorder scores are recomputed from the accumulated symptoms with
+    the disorder kernel.
+
+    Turns of one session must not overlap: callers hold ``lock`` while
+    calling :meth:`add_turn`. Readers use ``snapshot``, the summary published
+    at the end of the last turn, and never wait for a turn in progress.
+    """
+
+    def __init__(self, session_id=None, detection_threshold=0.3, recent_turns=20):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.detection_threshold = detection_threshold
+        self.turns = 0
+        self.symptoms = {}
+        self.detected = set()
+        self.sentiment_sum = 0.0
+        self.intensity_sum = 0.0
+        self.sentiment_ema = None
+        self.recent_sentiment = deque(maxlen=recent_turns)
+        self.disorder_scores = {}
+        self.lock = threading.Lock()
+        self.snapshot = self.summary()
+
+    def add_turn(self, text, context=None):
+        """Fold one user message into the state and return this turn's symptom confidences."""
+        context = context or AnalysisContext(text)
+        confidences = score_contexts([context])[0]
+        extracted = nlp.extract_symptoms(text, nlp.get_all_symptoms_from_kg(), context)
+        compound = context.sentiment['scores']['compound']
+
+        self.turns += 1
+        for symptom, confidence in confidences.items():
+            if confidence['overall_confidence'] > self.detection_threshold:
+                self._record(symptom, confidence['overall_confidence'])
+        for symptom in extracted:
+            self._record(symptom, None)
+
+        self.sentiment_sum += compound
+        self.intensity_sum += context.sentiment['intensity']
+        self.sentiment_ema = compound if self.sentiment_ema is None else (
+            SENTIMENT_EMA_ALPHA * compound + (1 - SENTIMENT_EMA_ALPHA) * self.sentiment_ema
+        )
+        self.recent_sentiment.append(compound)
+
+        # Mean intensity over turns stands in for the sentiment of the joined responses
+        self.disorder_scores = nlp.get_disorder_kernel().score(
+            [self.detected], [self.intensity_sum / self.turns]
+        )[0]
+        self.snapshot = self.summary()
+        return confidences
+
+    def _record(self, symptom, confidence):
+        key = symptom_key(symptom)
+        entry = self.symptoms.setdefault(key, {
+            'symptom': symptom, 'max_confidence': None, 'turn_count': 0, 'first_turn': self.turns, 'last_turn': None
+        })
+        if confidence is not None and (entry['max_confidence'] is None or confidence > entry['max_confidence']):
+            entry['max_confidence'] = confidence
+        # A count and the first/last turn instead of every turn, so long sessions stay constant-size
+        if entry['last_turn'] != self.turns:
+            entry['turn_count'] += 1
+            entry['last_turn'] = self.turns
+        self.detected.add(key)
+
+    def summary(self):
+        return {
+            'session_id': self.session_id,
+            'turns': self.turns,
+            'symptoms': [dict(entry) for entry in sorted(self.symptoms.values(), key=lambda entry: -(entry['max_confidence'] or 0))],
+            'sentiment_trend': {
+                'mean': self.sentiment_sum / self.turns if self.turns else 0.0,
+                'ema': self.sentiment_ema or 0.0,
+                'recent': list(self.recent_sentiment)
+            },
+            'disorder_scores': dict(sorted(self.disorder_scores.items(), key=lambda item: -item[1]))
+        }
+
+
+class SessionStore:
+    """Bounded LRU of conversation states that expire after ``ttl_seconds`` without a turn."""
+
+    def __init__(self, max_sessions=10000, ttl_seconds=1800.0, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def create(self, **options):
+        state = ConversationState(**options)
+        self.purge_expired()
+        with self._lock:
+            self._sessions[state.session_id] = (self._clock() + self.ttl_seconds, state)
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        return state
+
+    def get(self, session_id):
+        """Return the live session (extending its expiry) or None."""
+        now = self._clock()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, state = entry
+            if expires_at <= now:
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            self._sessions[session_id] = (now + self.ttl_seconds, state)
+            self._sessions.move_to_end(session_id)
+            return state
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def purge_expired(self):
+        """Drop every expired session; returns how many were removed."""
+        now = self._clock()
+        removed = 0
+        with self._lock:
+            # Sessions are kept in expiry order, so stop at the first live one
+            while self._sessions:
+                session_id, (expires_at, _) = next(iter(self._sessions.items()))
+                if expires_at > now:
+                    break
+                del self._sessions[session_id]
+                removed += 1
+            self.expired += removed
+        return removed
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'ttl_seconds': self.ttl_seconds,
+                'created': self.created,
+                'expired': self.expired,
+                'evicted': self.evicted
+            }
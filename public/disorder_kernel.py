@@ -0,0 +1,100 @@
+import re
+
+import numpy as np
+from scipy import sparse
+
+_SEPARATORS = re.compile(r"[\s\-]+")
+
+
+def symptom_key(name):
+    """Canonical symptom name: 'Loss of Interest' and 'loss_of_interest' both map to 'loss_of_interest'."""
+    return _SEPARATORS.sub("_", name.strip().lower())
+
+
+class DisorderKernel:
+    """Sparse symptom x disorder incidence matrix for vectorised disorder scoring.
+
+    Rows are canonical symptom keys and columns are disorders. Multiplying a
+    (messages x symptoms) detection matrix by the incidence matrix yields the
+    number of matching symptoms per disorder for every message in one step.
+    """
+
+    def __init__(self, symptoms, disorders, incidence):
+        self.symptoms = list(symptoms)
+        self.disorders = list(disorders)
+        self.symptom_ids = {symptom: i for i, symptom in enumerate(self.symptoms)}
+        self.incidence = sparse.csr_matrix(incidence, dtype=np.float64)
+        self.disorder_sizes = np.asarray(self.incidence.sum(axis=0)).ravel()
+
+    @classmethod
+    def build(cls, edges):
+        """Build from ``(disorder, symptom)`` pairs; duplicate pairs are counted once."""
+        symptoms = {}
+        disorders = {}
+        cells = set()
+        for disorder, symptom in edges:
+            row = symptoms.setdefault(symptom_key(symptom), len(symptoms))
+            col = disorders.setdefault(disorder, len(disorders))
+            cells.add((row, col))
+        rows, cols = zip(*sorted(cells)) if cells else ((), ())
+        incidence = sparse.coo_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+            shape=(len(symptoms), len(disorders))
+        )
+        return cls(symptoms, disorders, incidence)
+
+    @classmethod
+    def from_catalogue(cls, disorder_symptoms):
+        """Build from a ``{disorder: [symptoms]}`` mapping."""
+        return cls.build((disorder, symptom) for disorder, symptoms in disorder_symptoms.items() for symptom in symptoms)
+
+    @classmethod
+    def from_graph(cls, graph, namespace):
+        """Build from the ``hasSymptom`` edges of an rdflib knowledge graph."""
+        def local_name(node):
+            return str(node).split("#")[-1]
+        return cls.build(
+            (local_name(disorder), local_name(symptom))
+            for disorder, symptom in graph.subject_objects(namespace.hasSymptom)
+        )
+
+    def disorders_for(self, symptom):
+        """Disorders that list ``symptom`` (any spelling), in catalogue order."""
+        row = self.symptom_ids.get(symptom_key(symptom))
+        if row is None:
+            return []
+        start, end = self.incidence.indptr[row], self.incidence.indptr[row + 1]
+        return [self.disorders[col] for col in sorted(self.incidence.indices[start:end])]
+
+    def detection_matrix(self, detected_sets):
+        """Binary (messages x symptoms) matrix from one collection of symptom names per message."""
+        rows, cols = [], []
+        for row, detected in enumerate(detected_sets):
+            for col in {self.symptom_ids.get(symptom_key(symptom)) for symptom in detected}:
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+        return sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+            shape=(len(detected_sets), len(self.symptoms))
+        )
+
+    def match_counts(self, detection):
+        """Number of detected symptoms per disorder, shape (messages, disorders)."""
+        counts = detection @ self.incidence
+        return counts.toarray() if sparse.issparse(counts) else np.asarray(counts)
+
+    def score(self, detected_sets, intensities):
+        """Disorder confidence (0-100) per message, as used by ``analyze_disorders``.
+
+        Confidence is the percentage of a disorder's symptoms that were
+        detected plus 20 points per unit of sentiment intensity, capped at 100.
+        Disorders with no matching symptom are omitted.
+        """
+        counts = self.match_counts(self.detection_matrix(detected_sets))
+        intensities = np.asarray(intensities, dtype=np.float64)[:, np.newaxis]
+        confidence = np.minimum(counts / self.disorder_sizes * 100 + intensities * 20, 100)
+        return [
+            {self.disorders[col]: float(confidence[row, col]) for col in np.flatnonzero(counts[row])}
+            for row in range(counts.shape[0])
+        ]
@@ -0,0 +1,180 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# SQLite caps the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+# Recency is tracked coarsely to keep writes off the read path: a hit only
+# refreshes rows last used more than TOUCH_AFTER seconds ago, and refreshes
+# are written in one transaction once TOUCH_BATCH are queued or
+# TOUCH_FLUSH_SECONDS have passed
+TOUCH_AFTER = 600.0
+TOUCH_BATCH = 256
+TOUCH_FLUSH_SECONDS = 30.0
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+class EmbeddingStore:
+    """Content-addressed, on-disk embedding cache backed by SQLite.
+
+    Vectors are keyed by model name plus the SHA-256 of the text (the text
+    itself is never stored). The database runs in WAL mode so several worker
+    processes on one host can read and write the same file concurrently.
+    The table is bounded to ``max_entries`` rows: every ``prune_every``
+    inserts (1% of the cap by default) the least recently used vectors past
+    the cap are dropped, as in ``TranslationCache``. Between prunes the
+    table may exceed the cap by up to ``prune_every`` rows per process.
+    """
+
+    def __init__(self, path, model_name, max_entries=100000, prune_every=None):
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.prune_every = prune_every or max(1, max_entries // 100)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        # Bookkeeping shared by the threads of this process: queued recency refreshes and inserts since the last prune
+        self._bookkeeping_lock = threading.Lock()
+        self._touched = set()
+        self._touch_flushed_at = time.monotonic()
+        self._inserts = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text_hash BLOB NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+                "used_at REAL NOT NULL DEFAULT 0, PRIMARY KEY (model, text_hash)) WITHOUT ROWID"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(embeddings)")]
+            if 'used_at' not in columns:
+                # Databases created before the size cap; their rows are evicted first
+                conn.execute("ALTER TABLE embeddings ADD COLUMN used_at REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used_at ON embeddings (used_at)")
+
+    def _connection(self):
+        # One connection per thread and process; sqlite3 connections are not
+        # thread-safe and must not be used across a fork (see serve.py)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, texts):
+        """Return ``{position: vector}`` for every text in ``texts`` that is already stored."""
+        hashes = [text_hash(text) for text in texts]
+        positions = {}
+        for i, digest in enumerate(hashes):
+            positions.setdefault(digest, []).append(i)
+
+        found = {}
+        stale = []
+        stale_before = time.time() - TOUCH_AFTER
+        conn = self._connection()
+        unique = list(positions)
+        for start in range(0, len(unique), _QUERY_CHUNK):
+            chunk = unique[start:start + _QUERY_CHUNK]
+            rows = conn.execute(
+                f"SELECT text_hash, dim, vector, used_at FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                [self.model_name, *chunk]
+            ).fetchall()
+            for digest, dim, blob, used_at in rows:
+                vector = np.frombuffer(blob, dtype=np.float32, count=dim)
+                if used_at < stale_before:
+                    stale.append(bytes(digest))
+                for i in positions[bytes(digest)]:
+                    found[i] = vector
+        self._touch(conn, stale)
+
+        with self._stats_lock:
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def _touch(self, conn, digests):
+        """Queue recency refreshes and write them in one transaction when a batch is due."""
+        with self._bookkeeping_lock:
+            self._touched.update(digests)
+            due = self._touched and (
+                len(self._touched) >= TOUCH_BATCH or time.monotonic() - self._touch_flushed_at >= TOUCH_FLUSH_SECONDS
+            )
+            if not due:
+                return
+            touched, self._touched = self._touched, set()
+            self._touch_flushed_at = time.monotonic()
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "UPDATE embeddings SET used_at = ? WHERE model = ? AND text_hash = ?",
+                [(now, self.model_name, digest) for digest in touched]
+            )
+
+    def put_many(self, texts, vectors):
+        """Store one vector per text, replacing any existing entry; prunes to ``max_entries`` every ``prune_every`` inserts."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        now = time.time()
+        conn = self._connection()
+        with self._bookkeeping_lock:
+            self._inserts += len(vectors)
+            prune = self._inserts >= self.prune_every
+            if prune:
+                self._inserts = 0
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, used_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.model_name, text_hash(text), vector.shape[0], vector.tobytes(), now)
+                    for text, vector in zip(texts, vectors)
+                ]
+            )
+            if prune:
+                excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    conn.execute(
+                        "DELETE FROM embeddings WHERE (model, text_hash) IN "
+                        "(SELECT model, text_hash FROM embeddings ORDER BY used_at LIMIT ?)",
+                        (excess,)
+                    )
+
+    def encode(self, texts, encode_fn):
+        """Encode ``texts``, running ``encode_fn`` only on texts that are not stored yet."""
+        texts = list(texts)
+        found = self.get_many(texts)
+        missing = [i for i in range(len(texts)) if i not in found]
+        if missing:
+            missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+            computed = np.asarray(encode_fn(missing_texts), dtype=np.float32)
+            self.put_many(missing_texts, computed)
+            by_text = dict(zip(missing_texts, computed))
+            for i in missing:
+                found[i] = by_text[texts[i]]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([found[i] for i in range(len(texts))])
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'model': self.model_name,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
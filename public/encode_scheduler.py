@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+
+class SchedulerClosedError(Exception):
+    """Raised for queued requests the closed scheduler will not run; callers encode directly."""
+
+
+def _histogram_buckets(max_batch_size):
+    buckets = []
+    bound = 1
+    while bound < max_batch_size:
+        buckets.append(bound)
+        bound *= 2
+    buckets.append(max_batch_size)
+    return buckets
+
+
+class EncodeScheduler:
+    """Dynamic micro-batching in front of a sentence encoder.
+
+    Concurrent callers submit small encode requests; a single background
+    thread collects them for up to ``max_wait_ms`` or until ``max_batch_size``
+    texts are queued, runs one batched ``encode_fn`` call and hands each
+    caller back its own rows. A batch never exceeds ``max_batch_size`` texts:
+    a request that does not fit starts the next batch. Requests that are
+    already at least a full batch are encoded directly in the caller's thread.
+    Callers wait at most ``result_timeout`` seconds for their rows.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=32, max_wait_ms=5.0, result_timeout=60.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.result_timeout = result_timeout
+        self._queue = queue.Queue()
+        # Request taken off the queue that did not fit in the previous batch
+        self._carry = None
+        self._lock = threading.Lock()
+        self._buckets = _histogram_buckets(max_batch_size)
+        self._histogram = [0] * (len(self._buckets) + 1)
+        self._batches = 0
+        self._items = 0
+        self._requests = 0
+        self._queue_wait_total = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='encode-scheduler', daemon=True)
+        self._thread.start()
+
+    def encode(self, texts):
+        """Encode ``texts`` and return one embedding row per text."""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if len(texts) >= self.max_batch_size or self._closed:
+            result = np.asarray(self.encode_fn(texts))
+            self._record(len(texts), 1, 0.0)
+            return result
+
+        future = Future()
+        self._queue.put((texts, future, time.perf_counter()))
+        if self._closed:
+            # close() ran between the check above and the put: nothing will take this request
+            self._fail_queued()
+        try:
+            return future.result(timeout=self.result_timeout)
+        except SchedulerClosedError:
+            return self.encode(texts)
+        except FutureTimeoutError:
+            raise TimeoutError(f"Encode request not served within {self.result_timeout} seconds")
+
+    def _collect(self):
+        first, self._carry = self._carry, None
+        if first is None:
+            first = self._queue.get()
+        if first is None:
+            return None
+        pending = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            if size + len(item[0]) > self.max_batch_size:
+                self._carry = item
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            if pending is None:
+                return
+
+            texts = [text for item_texts, _, _ in pending for text in item_texts]
+            started = time.perf_counter()
+            try:
+                embeddings = np.asarray(self.encode_fn(texts))
+            except Exception as e:
+                for _, future, _ in pending:
+                    future.set_exception(e)
+                continue
+
+            self._record(len(texts), len(pending), sum(started - enqueued for _, _, enqueued in pending))
+            offset = 0
+            for item_texts, future, _ in pending:
+                future.set_result(embeddings[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def _record(self, batch_size, requests, queue_wait):
+        with self._lock:
+            self._batches += 1
+            self._items += batch_size
+            self._requests += requests
+            self._queue_wait_total += queue_wait
+            for i, bound in enumerate(self._buckets):
+                if batch_size <= bound:
+                    self._histogram[i] += 1
+                    break
+            else:
+                # Oversized requests encoded directly by the caller
+                self._histogram[-1] += 1
+
+    def stats(self):
+        """Snapshot of batch-size distribution and queueing counters."""
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': self._batches,
+                'requests': self._requests,
+                'items': self._items,
+                'mean_batch_size': self._items / self._batches if self._batches else 0.0,
+                'mean_queue_wait_ms': self._queue_wait_total * 1000.0 / self._requests if self._requests else 0.0,
+                'queue_depth': self._queue.qsize(),
+                # Batch counts keyed by the upper bound of each size bucket
+                'batch_size_histogram': dict(zip([str(b) for b in self._buckets] + ['+Inf'], self._histogram))
+            }
+
+    def _fail_queued(self):
+        """Fail every request still queued; their callers then encode directly."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(SchedulerClosedError("Encode scheduler is closed"))
+        # Keep the stop marker for a thread that is still finishing its last batch
+        self._queue.put(None)
+
+    def close(self):
+        """Stop the background thread; queued and later calls encode directly."""
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=1.0)
+        self._fail_queued()
@@ -0,0 +1,241 @@
+"""Pluggable sentence-encoder backends for the MiniLM model.
+
+``torch`` is the reference fp32 SentenceTransformer. ``torch-int8`` applies
+dynamic int8 quantization to its Linear layers and ``onnx`` runs an ONNX
+Runtime export of the same model. All backends return L2-normalised
+embeddings so they are interchangeable in the symptom index.
+
+Export the ONNX model and check a backend against the reference with::
+
+    python encoders.py export-onnx data/onnx/all-MiniLM-L6-v2
+    python encoders.py compare onnx --tolerance 0.02
+"""
+import argparse
+import sys
+
+import numpy as np
+
+from symptom_index import normalize_rows
+
+
+class SentenceTransformerEncoder:
+    """Reference backend: full-precision SentenceTransformer on PyTorch."""
+
+    backend = 'torch'
+
+    def __init__(self, model_name, cache_folder=None, batch_size=32):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, cache_folder=cache_folder)
+
+    def encode(self, texts, batch_size=None):
+        embeddings = self.model.encode(
+            list(texts),
+            batch_size=batch_size or self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return normalize_rows(embeddings)
+
+
+class QuantizedSentenceTransformerEncoder(SentenceTransformerEncoder):
+    """SentenceTransformer with dynamic int8 quantization of its Linear layers (CPU only)."""
+
+    backend = 'torch-int8'
+
+    def __init__(self, model_name, cache_folder=None, batch_size=32):
+        super().__init__(model_name, cache_folder=cache_folder, batch_size=batch_size)
+        import torch
+        self.model = torch.quantization.quantize_dynamic(self.model.to('cpu'), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxEncoder:
+    """ONNX Runtime export of the model with mean pooling, as in the SentenceTransformer pipeline."""
+
+    backend = 'onnx'
+
+    def __init__(self, model_path, batch_size=32, threads=None, max_length=256):
+        import os
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.model_name = model_path
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_path, 'model.onnx'), options, providers=['CPUExecutionProvider']
+        )
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def encode(self, texts, batch_size=None):
+        texts = list(texts)
+        batch_size = batch_size or self.batch_size
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + batch_size], padding=True, truncation=True,
+                max_length=self.max_length, return_tensors='np'
+            )
+            feed = {name: value.astype(np.int64) for name, value in inputs.items() if name in self._input_names}
+            token_embeddings = self.session.run(None, feed)[0]
+            mask = inputs['attention_mask'][..., np.newaxis].astype(np.float32)
+            chunks.append((token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        if not chunks:
+            return np.zeros((0, 0), dtype=np.float32)
+        return normalize_rows(np.concatenate(chunks))
+
+
+ENCODER_BACKENDS = ['torch', 'torch-int8', 'onnx']
+
+
+def create_encoder(backend, model_name, cache_folder=None, batch_size=32, onnx_model_path=None, onnx_threads=None):
+    """Instantiate the encoder backend selected by configuration."""
+    if backend == 'torch':
+        return SentenceTransformerEncoder(model_name, cache_folder=cache_folder, batch_size=batch_size)
+    if backend == 'torch-int8':
+        return QuantizedSentenceTransformerEncoder(model_name, cache_folder=cache_folder, batch_size=batch_size)
+    if backend == 'onnx':
+        if not onnx_model_path:
+            raise ValueError("The onnx encoder backend needs HDW_ONNX_MODEL_PATH (see 'python encoders.py export-onnx')")
+        return OnnxEncoder(onnx_model_path, batch_size=batch_size, threads=onnx_threads)
+    raise ValueError(f"Unknown encoder backend '{backend}'. Choose from: {', '.join(ENCODER_BACKENDS)}")
+
+
+def export_onnx(model_name, output_dir, cache_folder=None):
+    """Export the transformer of a SentenceTransformer model, plus its tokenizer, to ONNX."""
+    import os
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, cache_folder=cache_folder)
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    os.makedirs(output_dir, exist_ok=True)
+
+    sample = tokenizer(["I feel down"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['token_embeddings'] = {0: 'batch', 1: 'sequence'}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            os.path.join(output_dir, 'model.onnx'),
+            input_names=input_names,
+            output_names=['token_embeddings'],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    tokenizer.save_pretrained(output_dir)
+    return output_dir
+
+
+# Fixed messages used to check that a backend matches the reference scores
+PARITY_CORPUS = [
+    "I feel down and I can't stop crying",
+    "I've been so tired lately, I have no energy at all",
+    "Nothing excites me anymore and I feel numb",
+    "I can't sleep, I keep tossing and turning every night",
+    "I feel like giving up, nothing will ever get better",
+    "I have no appetite and I forget to eat",
+    "I overthink everything and I'm worried all the time",
+    "I can't sit still, I'm always fidgeting",
+    "My heart is racing and I feel like I'm dying",
+    "I can't catch my breath and my chest feels tight",
+    "My palms are always wet and I sweat too much",
+    "My emotions change so fast, I go from happy to sad quickly",
+    "I feel unstoppable and I talk really fast",
+    "I act without thinking and spend too much money",
+    "I snap at people and I have a short fuse",
+    "I hear voices and see shadows moving",
+    "I think someone is after me and people are watching me",
+    "I jump from one topic to another and people don't understand me",
+    "My brain feels foggy and I forget things easily",
+    "I avoid people and prefer being alone",
+    "I had a great day at the park with my friends",
+    "The weather is nice today",
+    "I'm excited about my new job",
+    "Can you recommend a good book?"
+]
+
+
+def compare_backends(reference, candidate, symptom_expressions, corpus=PARITY_CORPUS, threshold=0.3):
+    """Compare symptom confidence scores of two encoders on a fixed corpus.
+
+    Both encoders build their own symptom index and score every corpus
+    message against every symptom; the fuzzy and sentiment parts of the
+    confidence are shared. Returns the largest and mean absolute difference
+    in semantic similarity and overall confidence, plus how often the two
+    backends agree on the detection threshold.
+    """
+    from fuzzy import FuzzyMatcher
+    from nlp import CONFIDENCE_WEIGHTS, analyze_sentiment
+    from symptom_index import SymptomIndex
+
+    semantic = []
+    for encoder in (reference, candidate):
+        index = SymptomIndex.build(symptom_expressions, encoder.encode, encoder.model_name)
+        semantic.append(index.semantic_scores(encoder.encode(corpus)))
+
+    intensity = np.array([analyze_sentiment(text)['intensity'] for text in corpus])[:, np.newaxis]
+    matcher = FuzzyMatcher(index.symptom_texts)
+    shared = CONFIDENCE_WEIGHTS['sentiment'] * intensity + CONFIDENCE_WEIGHTS['fuzzy'] * np.array([
+        matcher.scores(text) for text in corpus
+    ])
+    overall = [CONFIDENCE_WEIGHTS['semantic'] * scores + shared for scores in semantic]
+
+    semantic_difference = np.abs(semantic[0] - semantic[1])
+    confidence_difference = np.abs(overall[0] - overall[1])
+    return {
+        'reference': reference.backend,
+        'candidate': candidate.backend,
+        'messages': len(corpus),
+        'max_semantic_difference': float(semantic_difference.max()),
+        'mean_semantic_difference': float(semantic_difference.mean()),
+        'max_confidence_difference': float(confidence_difference.max()),
+        'mean_confidence_difference': float(confidence_difference.mean()),
+        'detection_agreement': float(((overall[0] > threshold) == (overall[1] > threshold)).mean())
+    }
+
+
+def main(argv):
+    import config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export-onnx', help='export the sentence model to ONNX')
+    export.add_argument('output_dir')
+    compare = commands.add_parser('compare', help='compare a backend against the torch reference')
+    compare.add_argument('backend', choices=ENCODER_BACKENDS)
+    compare.add_argument('--tolerance', type=float, default=0.02, help='maximum allowed confidence difference')
+    args = parser.parse_args(argv)
+
+    if args.command == 'export-onnx':
+        print(f"Exported ONNX model to {export_onnx(config.SENTENCE_MODEL_NAME, args.output_dir, config.MODEL_CACHE_DIR)}")
+        return 0
+
+    from nlp import symptom_expressions
+
+    def build(backend):
+        return create_encoder(
+            backend, config.SENTENCE_MODEL_NAME, cache_folder=config.MODEL_CACHE_DIR,
+            onnx_model_path=config.ONNX_MODEL_PATH, onnx_threads=config.ONNX_THREADS
+        )
+
+    report = compare_backends(build('torch'), build(args.backend), symptom_expressions)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if report['max_confidence_difference'] > args.tolerance:
+        print(f"FAIL: confidence differs by more than {args.tolerance}")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
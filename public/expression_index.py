@@ -0,0 +1,58 @@
+from collections import Counter
+
+
+class ExpressionIndex:
+    """Inverted index from preprocessed token to the symptom expressions containing it.
+
+    Expressions are preprocessed once at build time. Matching a phrase only
+    touches the postings of its own tokens, and the number of distinct tokens
+    a phrase shares with each expression is read straight off the postings.
+    """
+
+    def __init__(self, symptoms, expressions, lengths, postings):
+        self.symptoms = symptoms        # expression id -> symptom name
+        self.expressions = expressions  # expression id -> original text
+        self.lengths = lengths          # expression id -> preprocessed token count
+        self.postings = postings        # token -> list of expression ids
+
+    @classmethod
+    def build(cls, symptom_expressions, preprocess_many):
+        """Preprocess every expression with ``preprocess_many`` and index its tokens."""
+        symptoms = []
+        expressions = []
+        for symptom, symptom_phrasings in symptom_expressions.items():
+            for expression in symptom_phrasings:
+                symptoms.append(symptom)
+                expressions.append(expression)
+
+        lengths = []
+        postings = {}
+        for expression_id, processed in enumerate(preprocess_many(expressions)):
+            tokens = processed.split()
+            lengths.append(len(tokens))
+            for token in set(tokens):
+                postings.setdefault(token, []).append(expression_id)
+
+        return cls(symptoms, expressions, lengths, postings)
+
+    def overlaps(self, tokens):
+        """Count the distinct tokens shared with every expression that shares at least one."""
+        counts = Counter()
+        for token in set(tokens):
+            counts.update(self.postings.get(token, ()))
+        return counts
+
+    def match(self, tokens, context_score=0.0, min_common=2, threshold=0.5):
+        """Symptoms whose expressions overlap ``tokens`` enough to count as a match.
+
+        An expression matches when it shares at least ``min_common`` tokens and
+        the shared fraction of its tokens plus ``context_score`` exceeds
+        ``threshold``.
+        """
+        matched = set()
+        for expression_id, common in self.overlaps(tokens).items():
+            if common >= min_common:
+                confidence = common / self.lengths[expression_id] + context_score
+                if confidence > threshold:
+                    matched.add(self.symptoms[expression_id])
+        return matched
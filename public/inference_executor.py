@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when the inference queue is full and a request cannot be accepted."""
+
+
+class InferenceTimeoutError(Exception):
+    """Raised when inference does not finish within the per-request timeout."""
+
+
+class InferenceExecutor:
+    """Bounded thread pool that keeps blocking model inference off the event loop.
+
+    ``max_workers`` threads run inference concurrently; at most ``max_pending``
+    jobs (running plus queued) are accepted at once and further submissions
+    fail fast with ``ExecutorSaturatedError``. A job that times out keeps its
+    slot until its thread actually finishes, so the limit reflects real load.
+    """
+
+    def __init__(self, max_workers, max_pending, timeout=None):
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='inference')
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """Number of jobs currently running or waiting for a worker."""
+        return self._pending
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            return True
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, timeout=None):
+        """Run ``fn(*args)`` on the pool and await its result."""
+        if not self._acquire():
+            raise ExecutorSaturatedError(f"Inference queue is full ({self.max_pending} pending requests)")
+
+        try:
+            # Carry context variables (such as the request trace) into the worker thread
+            future = self._executor.submit(contextvars.copy_context().run, fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise InferenceTimeoutError(f"Inference did not finish within {timeout} seconds")
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
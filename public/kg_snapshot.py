@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from atomic_file import atomic_write
+
+# Bump when the on-disk layout changes so stale snapshots are rebuilt.
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Node kinds and the edge relations compiled into the snapshot
+NODE_KINDS = ['disorder', 'symptom', 'therapy', 'treatment']
+RELATIONS = ['hasSymptom', 'hasTherapy', 'hasTreatment']
+
+
+def snapshot_fingerprint(kinds, edges, labels):
+    """Hash the compiled graph content to detect stale snapshots."""
+    payload = json.dumps(
+        {'format': SNAPSHOT_FORMAT_VERSION, 'kinds': kinds, 'edges': edges, 'labels': labels},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _content_fingerprint(kinds, edges, labels):
+    return snapshot_fingerprint(
+        {kind: list(names) for kind, names in kinds.items()},
+        {relation: [list(edge) for edge in pairs] for relation, pairs in edges.items()},
+        dict(labels)
+    )
+
+
+def _csr(pairs, n_nodes):
+    """``(indptr, indices)`` adjacency for ``(source_id, target_id)`` pairs, targets in insertion order."""
+    pairs = list(dict.fromkeys(pairs))
+    sources = np.array([source for source, _ in pairs], dtype=np.int32)
+    targets = np.array([target for _, target in pairs], dtype=np.int32)
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(n_nodes + 1, dtype=np.int32)
+    np.add.at(indptr, sources + 1, 1)
+    return np.cumsum(indptr, dtype=np.int32), targets[order]
+
+
+class KnowledgeGraphSnapshot:
+    """Immutable, compiled form of the knowledge graph.
+
+    Every node gets an integer id. Each relation is stored as CSR adjacency
+    (``indptr``, ``indices``) over those ids, so the neighbours of a node are
+    one slice away. The rdflib graph is only needed for SPARQL and export.
+    """
+
+    def __init__(self, nodes, kinds, relations, labels, fingerprint):
+        self.nodes = list(nodes)
+        self.node_ids = {node: i for i, node in enumerate(self.nodes)}
+        self.kinds = {kind: np.asarray(ids, dtype=np.int32) for kind, ids in kinds.items()}
+        self._kind_sets = {kind: frozenset(ids.tolist()) for kind, ids in self.kinds.items()}
+        self.relations = {
+            name: (np.asarray(indptr, dtype=np.int32), np.asarray(indices, dtype=np.int32))
+            for name, (indptr, indices) in relations.items()
+        }
+        self.labels = dict(labels)
+        self.fingerprint = fingerprint
+        self._inverse = {}
+
+    @classmethod
+    def build(cls, kinds, edges, labels=None):
+        """Compile ``{kind: [names]}`` and ``{relation: [(source, target)]}`` into a snapshot."""
+        labels = dict(labels or {})
+        nodes = {}
+
+        def node_id(name):
+            return nodes.setdefault(name, len(nodes))
+
+        kind_ids = {kind: list(dict.fromkeys(node_id(name) for name in kinds.get(kind, []))) for kind in NODE_KINDS}
+        edge_ids = {
+            relation: [(node_id(source), node_id(target)) for source, target in edges.get(relation, [])]
+            for relation in RELATIONS
+        }
+        relations = {relation: _csr(pairs, len(nodes)) for relation, pairs in edge_ids.items()}
+        return cls(nodes, kind_ids, relations, labels, _content_fingerprint(kinds, edges, labels))
+
+    @classmethod
+    def from_graph(cls, graph, namespace):
+        """Compile an rdflib knowledge graph that uses ``namespace`` for its nodes."""
+        from rdflib import RDF, RDFS
+
+        def local_name(node):
+            return str(node).split("#")[-1]
+
+        types = {
+            'disorder': namespace.MentalHealthDisorder,
+            'symptom': namespace.Symptom,
+            'therapy': namespace.Therapy,
+            'treatment': namespace.Treatment
+        }
+        kinds = {kind: sorted(local_name(node) for node in graph.subjects(RDF.type, node_type)) for kind, node_type in types.items()}
+        edges = {
+            relation: sorted((local_name(s), local_name(o)) for s, o in graph.subject_objects(namespace[relation]))
+            for relation in RELATIONS
+        }
+        labels = {local_name(node): str(label) for node, label in graph.subject_objects(RDFS.label)}
+        return cls.build(kinds, edges, labels)
+
+    def save(self, path):
+        """Write the snapshot to an uncompressed ``.npz`` file."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays = {
+            'nodes': np.array(self.nodes),
+            'label_nodes': np.array(list(self.labels), dtype=str),
+            'label_values': np.array(list(self.labels.values()), dtype=str),
+            'fingerprint': np.array(self.fingerprint)
+        }
+        for kind, ids in self.kinds.items():
+            arrays[f'kind_{kind}'] = ids
+        for relation, (indptr, indices) in self.relations.items():
+            arrays[f'{relation}_indptr'] = indptr
+            arrays[f'{relation}_indices'] = indices
+        with atomic_write(path) as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Read a snapshot written by :meth:`save`."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['nodes'].tolist(),
+                {kind: data[f'kind_{kind}'] for kind in NODE_KINDS},
+                {relation: (data[f'{relation}_indptr'], data[f'{relation}_indices']) for relation in RELATIONS},
+                dict(zip(data['label_nodes'].tolist(), data['label_values'].tolist())),
+                str(data['fingerprint'])
+            )
+
+    def nodes_of(self, kind):
+        """Names of every node of ``kind`` ('disorder', 'symptom', 'therapy' or 'treatment')."""
+        return [self.nodes[i] for i in self.kinds[kind]]
+
+    def has(self, kind, name):
+        node = self.node_ids.get(name)
+        return node is not None and node in self._kind_sets[kind]
+
+    def label(self, name):
+        return self.labels.get(name, name)
+
+    def neighbours(self, relation, name):
+        """Targets of ``relation`` edges leaving ``name``, e.g. the symptoms of a disorder."""
+        node = self.node_ids.get(name)
+        if node is None:
+            return []
+        indptr, indices = self.relations[relation]
+        return [self.nodes[i] for i in indices[indptr[node]:indptr[node + 1]]]
+
+    def _inverse_relation(self, relation):
+        if relation not in self._inverse:
+            indptr, indices = self.relations[relation]
+            sources = np.repeat(np.arange(len(self.nodes), dtype=np.int32), np.diff(indptr))
+            self._inverse[relation] = _csr(zip(indices.tolist(), sources.tolist()), len(self.nodes))
+        return self._inverse[relation]
+
+    def inverse_neighbours(self, relation, name):
+        """Sources of ``relation`` edges arriving at ``name``, e.g. the disorders listing a symptom."""
+        node = self.node_ids.get(name)
+        if node is None:
+            return []
+        indptr, indices = self._inverse_relation(relation)
+        return [self.nodes[i] for i in indices[indptr[node]:indptr[node + 1]]]
+
+
+def load_or_build(kinds, edges, labels=None, path=None):
+    """Load the snapshot from ``path`` if it matches the given graph content, otherwise compile and save it."""
+    fingerprint = _content_fingerprint(kinds, edges, labels or {})
+    if path and os.path.exists(path):
+        try:
+            snapshot = KnowledgeGraphSnapshot.load(path)
+            if snapshot.fingerprint == fingerprint:
+                return snapshot
+        except Exception as e:
+            print(f"Could not load knowledge graph snapshot from {path}: {e}")
+
+    snapshot = KnowledgeGraphSnapshot.build(kinds, edges, labels)
+    if path:
+        try:
+            snapshot.save(path)
+        except OSError as e:
+            print(f"Could not save knowledge graph snapshot to {path}: {e}")
+    return snapshot
@@ -0,0 +1,207 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Pipeline stages are timed with :func:`stage` (a context manager) or
+:func:`timed` (a decorator) into the ``hdw_stage_seconds`` histogram.
+Stages nest: the ``encode`` stage inside ``symptom_scoring`` is counted in
+both. Other state (caches, queues, model loading) is read when the metrics
+are scraped, through collectors registered with :func:`add_collector`.
+
+Stage timings also go to the active request trace (see ``tracing``). With
+``HDW_METRICS=0`` and ``HDW_DEBUG_TRACE=0`` nothing is recorded:
+:func:`timed` returns the function unchanged and :func:`stage` returns a
+shared no-op context.
+"""
+import bisect
+import contextlib
+import functools
+import threading
+import time
+
+import config
+import tracing
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow model loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        f'{name}="' + str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination."""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                # Per-bucket (not yet cumulative) counts, then sum
+                entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    samples.append((self.name + '_bucket', dict(labels, le=_format_value(float(bound))), cumulative))
+                samples.append((self.name + '_sum', labels, total))
+                samples.append((self.name + '_count', labels, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Metric families plus scrape-time collectors, rendered as Prometheus text."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        # Added to every sample, e.g. ``{'worker': '3'}`` in serve.py workers
+        self.const_labels = {}
+        self._metrics = []
+        self._collectors = []
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """``collector()`` returns ``(name, type, help, [(labels, value), ...])`` families at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(dict(self.const_labels, **labels))} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(dict(self.const_labels, **labels))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(config.METRICS_ENABLED)
+
+stage_seconds = registry.histogram('hdw_stage_seconds', 'Time spent in each analysis pipeline stage.', ['stage'])
+request_seconds = registry.histogram(
+    'hdw_http_request_seconds', 'HTTP request latency by endpoint and status code.', ['handler', 'method', 'status']
+)
+
+_NOOP = contextlib.nullcontext()
+
+# Stages are timed when either the metrics or per-request traces need them
+_instrumented = registry.enabled or config.DEBUG_TRACE_ENABLED
+
+
+def _observe(name, started):
+    elapsed = time.perf_counter() - started
+    if registry.enabled:
+        stage_seconds.observe(elapsed, name)
+    tracing.record(name, started, elapsed)
+
+
+@contextlib.contextmanager
+def _timed_stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe(name, started)
+
+
+def stage(name):
+    """Context manager timing one pipeline stage."""
+    return _timed_stage(name) if _instrumented else _NOOP
+
+
+def timed(name):
+    """Decorator timing every call of the function as pipeline stage ``name``."""
+    def decorate(fn):
+        if not _instrumented:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _observe(name, started)
+        return wrapper
+    return decorate
+
+
+def add_collector(collector):
+    registry.add_collector(collector)
+
+
+def render():
+    return registry.render()
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording ``hdw_http_request_seconds`` for every HTTP request.
+
+    Requests are labelled by the endpoint function that handled them, so
+    path parameters (session ids, disorder names) do not create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            endpoint = scope.get('endpoint')
+            handler = getattr(endpoint, '__name__', 'unmatched')
+            request_seconds.observe(time.perf_counter() - started, handler, scope.get('method', ''), str(status[0]))
@@ -1,29 +1,140 @@
-import nltk
-nltk.download('wordnet')
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('vader_lexicon', quiet=True) 
-
 # Add these imports at the top of nlp.py
+import os
+import sys
+import hashlib
 import random
-import spacy
-import emoji
-import string
+import threading
+import nltk
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords, wordnet
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
 from autocorrect import Speller
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
-from fuzzywuzzy import process
-from rdflib import Graph, Namespace, Literal, RDF, RDFS
 import numpy as np
-import random
 import json
-from googletrans import Translator
+import config
+import components
+import metrics
+import tracing
+from symptom_index import load_or_build
+from encode_scheduler import EncodeScheduler
+from preprocessing import TextPreprocessor
+from embedding_store import EmbeddingStore
+from vector_index import build_index, load_index
+from expression_index import ExpressionIndex
+from symptom_lexicon import SymptomLexicon, lexicon_fingerprint
+from disorder_kernel import DisorderKernel
+from kg_snapshot import KnowledgeGraphSnapshot, load_or_build as load_kg_snapshot
+from recommendations import RecommendationIndex, disorder_key
+from chunking import split_spans, pool_scores
+from fuzzy import FuzzyMatcher, ratio as fuzz_ratio
+from translation import TranslationCache, TranslationService, create_backend as create_translation_backend
+from translation import load_catalogue as load_translation_catalogue
+
+# Heavy models, corpora and the knowledge graph are loaded lazily (see the
+# loaders below) so importing this module never touches the network.
+if config.NLTK_DATA_DIR:
+    nltk.data.path.insert(0, config.NLTK_DATA_DIR)
+
+if config.OFFLINE:
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+    'vader_lexicon': 'sentiment/vader_lexicon.zip'
+}
+_available_nltk_resources = set()
+
+def ensure_nltk_resource(name):
+    """Make sure an NLTK corpus is available, downloading it only when online."""
+    if name in _available_nltk_resources:
+        return
+    try:
+        nltk.data.find(NLTK_RESOURCES[name])
+    except LookupError:
+        if config.OFFLINE:
+            raise LookupError(f"NLTK resource '{name}' not found and HDW_OFFLINE is set; provision it under HDW_NLTK_DATA")
+        nltk.download(name, download_dir=config.NLTK_DATA_DIR, quiet=True)
+        nltk.data.find(NLTK_RESOURCES[name])
+    _available_nltk_resources.add(name)
+
+def _load_translator():
+    backend_options = {'cache_folder': config.MODEL_CACHE_DIR} if config.TRANSLATION_BACKEND == 'marian' else {}
+    catalogue = catalogue_translation_seed()
+    for lang, entries in load_translation_catalogue(config.TRANSLATION_CATALOGUE_PATH).items():
+        catalogue.setdefault(lang, {}).update(entries)
+    return TranslationService(
+        create_translation_backend(config.TRANSLATION_BACKEND, **backend_options),
+        cache=TranslationCache(config.TRANSLATION_CACHE_PATH, config.TRANSLATION_CACHE_SIZE),
+        catalogue=catalogue
+    )
+
+def _load_sentiment_analyzer():
+    ensure_nltk_resource('vader_lexicon')
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+    return SentimentIntensityAnalyzer()
+
+def _load_sentence_model():
+    from encoders import create_encoder
+    return create_encoder(
+        config.ENCODER_BACKEND,
+        config.SENTENCE_MODEL_NAME,
+        cache_folder=config.MODEL_CACHE_DIR,
+        batch_size=config.ENCODE_BATCH_SIZE,
+        onnx_model_path=config.ONNX_MODEL_PATH,
+        onnx_threads=config.ONNX_THREADS
+    )
+
+def encoder_id():
+    """Identifies the embedding space: the model name plus any non-reference backend."""
+    if config.ENCODER_BACKEND == 'torch':
+        return config.SENTENCE_MODEL_NAME
+    return f"{config.SENTENCE_MODEL_NAME}@{config.ENCODER_BACKEND}"
+
+def _load_spacy():
+    import spacy
+    try:
+        return spacy.load(config.SPACY_MODEL)
+    except OSError:
+        if config.OFFLINE:
+            raise
+        print("Downloading spaCy model...")
+        import subprocess
+        subprocess.run([sys.executable, "-m", "spacy", "download", config.SPACY_MODEL], check=True)
+        return spacy.load(config.SPACY_MODEL)
+
+translator_component = components.register('translator', _load_translator)
+sentiment_component = components.register('sentiment_analyzer', _load_sentiment_analyzer)
+sentence_model_component = components.register('sentence_model', _load_sentence_model)
+spacy_component = components.register('spacy', _load_spacy)
+
+def get_translator():
+    return translator_component.get()
 
-# Initialize language support
-translator = Translator()
+def get_sentiment_analyzer():
+    return sentiment_component.get()
+
+def get_sentence_model():
+    return sentence_model_component.get()
+
+def get_spacy():
+    return spacy_component.get()
+
+def __getattr__(name):
+    # Backwards-compatible module attributes for the lazily loaded components
+    lazy_attributes = {
+        'translator': get_translator,
+        'sia': get_sentiment_analyzer,
+        'sentence_model': get_sentence_model,
+        'nlp': get_spacy,
+        'g': lambda: get_graph(),
+        'ex': lambda: get_namespace()
+    }
+    if name in lazy_attributes:
+        return lazy_attributes[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Severity levels and their descriptions
 severity_levels = {
@@ -54,16 +165,16 @@ severity_levels = {
 }
 
 def translate_text(text, target_lang='en'):
-    """Translate text to target language."""
+    """Translate English text to target language (catalogue, then cache, then local backend)."""
+    if target_lang == 'en':
+        return text
     try:
-        if target_lang == 'en':
-            return text
-        translation = translator.translate(text, dest=target_lang)
-        return translation.text
+        return get_translator().translate(text, target_lang)
     except Exception as e:
         print(f"Translation error: {e}")
         return text
 
+@metrics.timed('severity')
 def assess_severity(symptom_data):
     """Assess the severity of symptoms based on confidence scores and sentiment."""
     # Factors to consider for severity
@@ -95,26 +206,141 @@ def assess_severity(symptom_data):
 
 def get_language_specific_response(responses, lang='en'):
     """Get response in specified language."""
-    if lang == 'en':
-        return responses['en']
-    
-    try:
-        if lang not in responses:
-            translated = translate_text(responses['en'], lang)
-            responses[lang] = translated
+    if lang in responses:
         return responses[lang]
-    except Exception:
-        return responses['en']
+    return translate_text(responses['en'], lang)
+
+# Static user-facing chatbot text, pre-translated by 'build_assets.py translations'
+WELCOME_MESSAGES = [
+    "Hi there! I'm HeadDoWell, your mental wellness companion. How have you been feeling lately?",
+    "Hello! I'm HeadDoWell, and I'm here to listen and support you. How are you doing today?",
+    "Welcome! I'm HeadDoWell. This is a safe space to share whatever's on your mind. How have things been for you?"
+]
+
+# Supportive follow-up responses
+FOLLOW_UPS = [
+    "I hear you. Could you tell me more about that?",
+    "That sounds challenging. How long have you been feeling this way?",
+    "Thank you for sharing that. Would you like to elaborate?",
+    "I understand this isn't easy to talk about. What else is on your mind?"
+]
+
+def catalogue_translation_seed():
+    """Hand-written translations already in the catalogue, as ``{lang: {english: translation}}``."""
+    seed = {}
+    for info in severity_levels.values():
+        for lang, text in info['description'].items():
+            if lang != 'en':
+                seed.setdefault(lang, {})[info['description']['en']] = text
+    return seed
+
+def catalogue_strings():
+    """Every static English string shown to users, for pre-translation at build time."""
+    strings = [info['description']['en'] for info in severity_levels.values()]
+    strings.extend(WELCOME_MESSAGES)
+    strings.extend(FOLLOW_UPS)
+    for symptom_data in Anxiety.values():
+        strings.extend(symptom_data['questions'])
+        strings.extend(symptom_data['affirmations'])
+    return strings
+
+# Weights used to combine the individual match signals into one confidence score
+CONFIDENCE_WEIGHTS = {'semantic': 0.5, 'fuzzy': 0.3, 'sentiment': 0.2}
+
+_encode_scheduler = None
+_encode_scheduler_lock = threading.Lock()
+
+@metrics.timed('model_encode')
+def _encode_direct(texts, batch_size=None):
+    return get_sentence_model().encode(list(texts), batch_size=batch_size or config.ENCODE_BATCH_SIZE)
+
+def get_encode_scheduler():
+    """Return the shared micro-batching scheduler, or None when it is disabled."""
+    global _encode_scheduler
+    if _encode_scheduler is None and config.ENCODE_SCHEDULER_ENABLED:
+        # Concurrent first calls must not each start a scheduler thread
+        with _encode_scheduler_lock:
+            if _encode_scheduler is None:
+                _encode_scheduler = EncodeScheduler(
+                    _encode_direct,
+                    max_batch_size=config.ENCODE_SCHEDULER_MAX_BATCH,
+                    max_wait_ms=config.ENCODE_SCHEDULER_MAX_WAIT_MS
+                )
+    return _encode_scheduler
+
+def current_encode_scheduler():
+    """Return the scheduler if one is running, without starting it."""
+    return _encode_scheduler
+
+def _reset_encode_scheduler():
+    # The scheduler's thread does not survive a fork; the child starts its own on first use
+    global _encode_scheduler, _encode_scheduler_lock
+    _encode_scheduler = None
+    _encode_scheduler_lock = threading.Lock()
 
-# Initialize sentiment analyzer and sentence transformer
-sia = SentimentIntensityAnalyzer()
-sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+os.register_at_fork(after_in_child=_reset_encode_scheduler)
 
+def _load_embedding_store():
+    return EmbeddingStore(config.EMBEDDING_CACHE_PATH, encoder_id(), config.EMBEDDING_CACHE_SIZE)
+
+embedding_store_component = components.register('embedding_store', _load_embedding_store) if config.EMBEDDING_CACHE_ENABLED else None
+
+def get_embedding_store():
+    """Return the persistent embedding cache, or None when it is disabled."""
+    return embedding_store_component.get() if embedding_store_component is not None else None
+
+def loaded_embedding_store():
+    """Return the embedding cache if it is already open, without opening it."""
+    if embedding_store_component is None or not embedding_store_component.loaded:
+        return None
+    return embedding_store_component.get()
+
+def _encode_uncached(texts, batch_size=None):
+    scheduler = get_encode_scheduler()
+    if scheduler is None or batch_size is not None:
+        return _encode_direct(texts, batch_size)
+    return scheduler.encode(texts)
+
+@metrics.timed('encode')
+def encode_texts(texts, batch_size=None):
+    """Encode a list of texts with the sentence model.
+
+    Texts already in the persistent embedding cache are not re-encoded. Small
+    requests go through the micro-batching scheduler so concurrent callers
+    share one forward pass; an explicit ``batch_size`` bypasses it.
+    """
+    tracing.add('encode_calls')
+    tracing.add('encoded_texts', len(texts))
+    store = get_embedding_store()
+    if store is None:
+        return _encode_uncached(texts, batch_size)
+    return store.encode(texts, lambda missing: _encode_uncached(missing, batch_size))
+
+def fuzzy_ratio(text_a, text_b):
+    """Case-insensitive fuzzy string similarity on a 0-1 scale (same scores as ``fuzz.ratio``)."""
+    return fuzz_ratio(text_a, text_b)
+
+def combine_confidence(semantic_similarity, fuzzy_match, sentiment_intensity):
+    """Combine the individual match signals into a confidence breakdown."""
+    confidence_score = (
+        CONFIDENCE_WEIGHTS['semantic'] * semantic_similarity +
+        CONFIDENCE_WEIGHTS['fuzzy'] * fuzzy_match +
+        CONFIDENCE_WEIGHTS['sentiment'] * sentiment_intensity
+    )
+    return {
+        'overall_confidence': float(confidence_score),
+        'semantic_similarity': float(semantic_similarity),
+        'fuzzy_match': float(fuzzy_match),
+        'sentiment_intensity': float(sentiment_intensity)
+    }
+
+@metrics.timed('sentiment')
 def analyze_sentiment(text):
     """Analyze the sentiment and emotional intensity of text."""
     if not text or not isinstance(text, str):
         raise ValueError("Input text must be a non-empty string")
-    sentiment_scores = sia.polarity_scores(text)
+    tracing.add('sentiment_passes')
+    sentiment_scores = get_sentiment_analyzer().polarity_scores(text)
     
     # Determine overall sentiment
     compound = sentiment_scores['compound']
@@ -134,54 +360,33 @@ def analyze_sentiment(text):
         'scores': sentiment_scores
     }
 
-def calculate_confidence_score(user_text, symptom_expression):
-    """Calculate confidence score for symptom match using multiple metrics."""
+@metrics.timed('confidence_score')
+def calculate_confidence_score(user_text, symptom_expression, context=None):
+    """Calculate confidence score for symptom match using multiple metrics.
+
+    Pass an ``AnalysisContext`` for ``user_text`` to reuse its embedding and
+    sentiment instead of recomputing them on every call.
+    """
     if not user_text or not symptom_expression:
         raise ValueError("Both user_text and symptom_expression must be non-empty strings")
     # Get embeddings  
-    user_embedding = sentence_model.encode([user_text])
-    symptom_embedding = sentence_model.encode([symptom_expression])  
+    if context is not None:
+        user_embedding = context.embedding
+        symptom_embedding = encode_texts([symptom_expression])[0]
+    else:
+        user_embedding, symptom_embedding = encode_texts([user_text, symptom_expression])
     
     # Calculate semantic similarity (0-1)
-    semantic_similarity = cosine_similarity(user_embedding, symptom_embedding)[0][0]
+    semantic_similarity = cosine_similarity([user_embedding], [symptom_embedding])[0][0]
     
-    # Calculate fuzzy string matching score (0-100)
-    fuzzy_ratio = process.ratio(user_text.lower(), symptom_expression.lower()) / 100
+    # Calculate fuzzy string matching score (0-1)
+    fuzzy_match = fuzzy_ratio(user_text, symptom_expression)
     
     # Get sentiment intensity
-    sentiment_intensity = analyze_sentiment(user_text)['intensity']
+    sentiment = context.sentiment if context is not None else analyze_sentiment(user_text)
+    sentiment_intensity = sentiment['intensity']
     
-    # Combine scores with weights
-    weights = {'semantic': 0.5, 'fuzzy': 0.3, 'sentiment': 0.2}
-    confidence_score = (
-        weights['semantic'] * semantic_similarity +
-        weights['fuzzy'] * fuzzy_ratio +
-        weights['sentiment'] * sentiment_intensity
-    )
-    
-    return {
-        'overall_confidence': confidence_score,
-        'semantic_similarity': semantic_similarity,
-        'fuzzy_match': fuzzy_ratio,
-        'sentiment_intensity': sentiment_intensity
-    }
-# Load SpaCy
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    print("Downloading spaCy model...")
-    import subprocess
-    subprocess.run(["python", "-m", "spacy", "download", "en_core_web_sm"])
-    nlp = spacy.load("en_core_web_sm")
-
-# Define RDF Namespace and graph
-g = Graph()
-ex = Namespace("http://example.org/mentalhealth#")
-
-# Define Base Classes
-g.add((ex.MentalHealthIssue, RDF.type, RDFS.Class))
-g.add((ex.Therapy, RDF.type, RDFS.Class))
-
+    return combine_confidence(semantic_similarity, fuzzy_match, sentiment_intensity)
 # Define Mental Health Disorders
 disorder_classes = [
     'Depression', 'Psychosis', 'AnxietyDisorder', 'BipolarDisorder', 'PTSD',
@@ -194,9 +399,6 @@ disorder_classes = [
     'ConductDisorder', 'SleepDisorder'
 ]
 
-for disorder in disorder_classes:
-    g.add((ex[disorder], RDF.type, RDFS.Class))
-
 # Define Therapy Classes and Labels
 therapy_labels = {
     'CBT': 'Cognitive Behavioral Therapy',
@@ -210,10 +412,6 @@ therapy_labels = {
     'EMDR': 'Eye Movement Desensitization and Reprocessing (EMDR)'
 }
 
-for therapy, label in therapy_labels.items():
-    g.add((ex[therapy], RDF.type, ex.Therapy))
-    g.add((ex[therapy], RDFS.label, Literal(label)))
-
 # Define therapy relationships
 therapy_relationships = {
     'Depression': ['CBT', 'Medication', 'MindfulnessTherapy'],
@@ -247,11 +445,6 @@ therapy_relationships = {
     'SleepDisorder': ['CBT', 'Medication']
 }
 
-# Add therapy relationships to graph
-for disorder, therapies in therapy_relationships.items():
-    for therapy in therapies:
-        g.add((ex[disorder], ex.hasTherapy, ex[therapy]))
-
 # Define disorders and their symptoms
 disorders = {
     "depression": ["sadness", "fatigue", "loss_of_interest", "sleep_disturbance", "hopelessness", "changes_in_appetite"],
@@ -313,26 +506,96 @@ treatments = {
     "borderline_personality_disorder": ["dialectical_behavior_therapy", "medication_for_mood_regulation", "self_help_strategies"],
     "insomnia": ["cognitive_behavioral_therapy_for_insomnia", "sleep_hygiene_improvements", "melatonin_supplements"]
 }
-# Add Disorders and their Symptoms
-for disorder, symptoms in disorders.items():
-    g.add((ex[disorder], RDF.type, ex.MentalHealthDisorder))
-    for symptom in symptoms:
-        g.add((ex[symptom], RDF.type, ex.Symptom))
-        g.add((ex[disorder], ex.hasSymptom, ex[symptom]))
-
-# Add Treatments
-for disorder, treat_list in treatments.items():
-    for treatment in treat_list:
-        g.add((ex[treatment], RDF.type, ex.Treatment))
-        g.add((ex[disorder], ex.hasTreatment, ex[treatment]))
-
-# Add temporal relationships to track symptom progression
-g.add((ex.Symptom, ex.hasTemporalRelation, ex.Duration))
-g.add((ex.Symptom, ex.hasIntensity, ex.Severity))
-
-# Add treatment success relationships
-g.add((ex.Treatment, ex.hasSuccessRate, ex.SuccessMetric))
-g.add((ex.Treatment, ex.hasSideEffect, ex.SideEffect))
+EX_NAMESPACE = "http://example.org/mentalhealth#"
+
+def get_namespace():
+    """RDF namespace used for every node in the knowledge graph."""
+    from rdflib import Namespace
+    return Namespace(EX_NAMESPACE)
+
+def build_graph():
+    """Build the mental health knowledge graph from the catalogues above."""
+    from rdflib import Graph, Literal, RDF, RDFS
+
+    # Define RDF Namespace and graph
+    g = Graph()
+    ex = get_namespace()
+
+    # Define Base Classes
+    g.add((ex.MentalHealthIssue, RDF.type, RDFS.Class))
+    g.add((ex.Therapy, RDF.type, RDFS.Class))
+
+    for disorder in disorder_classes:
+        g.add((ex[disorder], RDF.type, RDFS.Class))
+
+    for therapy, label in therapy_labels.items():
+        g.add((ex[therapy], RDF.type, ex.Therapy))
+        g.add((ex[therapy], RDFS.label, Literal(label)))
+
+    # Add therapy relationships to graph
+    for disorder, therapies in therapy_relationships.items():
+        for therapy in therapies:
+            g.add((ex[disorder], ex.hasTherapy, ex[therapy]))
+
+    # Add Disorders and their Symptoms
+    for disorder, symptoms in disorders.items():
+        g.add((ex[disorder], RDF.type, ex.MentalHealthDisorder))
+        for symptom in symptoms:
+            g.add((ex[symptom], RDF.type, ex.Symptom))
+            g.add((ex[disorder], ex.hasSymptom, ex[symptom]))
+
+    # Add Treatments
+    for disorder, treat_list in treatments.items():
+        for treatment in treat_list:
+            g.add((ex[treatment], RDF.type, ex.Treatment))
+            g.add((ex[disorder], ex.hasTreatment, ex[treatment]))
+
+    # Add temporal relationships to track symptom progression
+    g.add((ex.Symptom, ex.hasTemporalRelation, ex.Duration))
+    g.add((ex.Symptom, ex.hasIntensity, ex.Severity))
+
+    # Add treatment success relationships
+    g.add((ex.Treatment, ex.hasSuccessRate, ex.SuccessMetric))
+    g.add((ex.Treatment, ex.hasSideEffect, ex.SideEffect))
+
+    return g
+
+graph_component = components.register('knowledge_graph', build_graph)
+
+def get_graph():
+    """Return the rdflib knowledge graph, built on first use (for SPARQL and export)."""
+    return graph_component.get()
+
+def kg_catalogue():
+    """Node kinds, edges and labels of the knowledge graph, straight from the catalogues above."""
+    kinds = {
+        'disorder': list(disorders),
+        'symptom': [symptom for symptoms in disorders.values() for symptom in symptoms],
+        'therapy': list(therapy_labels),
+        'treatment': [treatment for treat_list in treatments.values() for treatment in treat_list]
+    }
+    edges = {
+        'hasSymptom': [(disorder, symptom) for disorder, symptoms in disorders.items() for symptom in symptoms],
+        'hasTherapy': [(disorder, therapy) for disorder, therapies in therapy_relationships.items() for therapy in therapies],
+        'hasTreatment': [(disorder, treatment) for disorder, treat_list in treatments.items() for treatment in treat_list]
+    }
+    return kinds, edges, therapy_labels
+
+def _load_kg_snapshot():
+    kinds, edges, labels = kg_catalogue()
+    return load_kg_snapshot(kinds, edges, labels, config.KG_SNAPSHOT_PATH)
+
+kg_snapshot_component = components.register('kg_snapshot', _load_kg_snapshot)
+
+def get_kg_snapshot():
+    """Return the compiled knowledge-graph snapshot with integer-id adjacency."""
+    return kg_snapshot_component.get()
+
+recommendation_index_component = components.register('recommendation_index', lambda: RecommendationIndex(get_kg_snapshot()))
+
+def get_recommendation_index():
+    """Return the precomputed disorder profiles and recommendation ranking over the snapshot."""
+    return recommendation_index_component.get()
 
 symptom_expressions = {
     # Depression Symptoms
@@ -464,10 +727,184 @@ symptom_expressions = {
         "I snap at people when I’m tired"
     ]
 }
+# 🔹 Precomputed symptom embedding index (built once, reused by every request)
+
+def _load_symptom_index():
+    return load_or_build(
+        symptom_expressions, encode_texts, encoder_id(), config.SYMPTOM_INDEX_PATH
+    )
+
+symptom_index_component = components.register('symptom_index', _load_symptom_index)
+
+def get_symptom_index():
+    """Return the symptom embedding index, loading it from disk or building it on first use."""
+    return symptom_index_component.get()
+
+fuzzy_matcher_component = components.register(
+    'fuzzy_matcher', lambda: FuzzyMatcher(get_symptom_index().symptom_texts, config.FUZZY_MAX_QUERY_CHARS)
+)
+
+def get_fuzzy_matcher():
+    """Return the batch fuzzy matcher over the symptom texts."""
+    return fuzzy_matcher_component.get()
+
+def _load_phrase_index():
+    index = get_symptom_index()
+    kind = config.PHRASE_INDEX_KIND
+    if kind == 'auto':
+        kind = 'ivf' if len(index.expressions) > config.PHRASE_INDEX_IVF_THRESHOLD else 'flat'
+    path = os.path.join(config.PHRASE_INDEX_DIR, f"phrase_index_{kind}_{index.fingerprint[:16]}.npz")
+    if os.path.exists(path):
+        try:
+            phrase_index = load_index(path)
+            if kind == 'ivf':
+                phrase_index.n_probe = config.PHRASE_INDEX_PROBE
+            return phrase_index
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load phrase index from {path}: {e}")
+
+    params = {'n_probe': config.PHRASE_INDEX_PROBE} if kind == 'ivf' else {}
+    phrase_index = build_index(kind, index.expression_vectors, **params)
+    try:
+        phrase_index.save(path)
+    except OSError as e:
+        print(f"Could not save phrase index to {path}: {e}")
+    return phrase_index
+
+phrase_index_component = components.register('phrase_index', _load_phrase_index)
+
+def get_phrase_index():
+    """Return the top-k vector index over every symptom expression."""
+    return phrase_index_component.get()
+
+def nearest_expressions(texts, k=5):
+    """Top-k most similar symptom expressions for each text.
+
+    Returns one list per text of ``{'symptom', 'expression', 'similarity'}``
+    dicts, best match first.
+    """
+    index = get_symptom_index()
+    scores, ids = get_phrase_index().search(encode_texts(texts), k)
+    return [
+        [
+            {
+                'symptom': index.expression_symptom(expression_id),
+                'expression': index.expressions[expression_id],
+                'similarity': float(score)
+            }
+            for score, expression_id in zip(row_scores, row_ids) if expression_id >= 0
+        ]
+        for row_scores, row_ids in zip(scores, ids)
+    ]
+
+def score_symptoms(user_text, sentiment=None):
+    """Score a message against every symptom with one encode call and one matrix multiply.
+
+    Returns a mapping of symptom name to the same confidence breakdown
+    produced by ``calculate_confidence_score``.
+    """
+    return score_symptoms_batch([user_text], [sentiment] if sentiment is not None else None)[0]
+
+def confidence_matrices(texts, sentiments, embeddings):
+    """Semantic, fuzzy, sentiment and overall (messages x symptoms) confidence matrices."""
+    index = get_symptom_index()
+    tracing.add('symptoms_scored', len(texts) * len(index.symptoms))
+    with metrics.stage('semantic_similarity'):
+        semantic = index.semantic_scores(np.asarray(embeddings))
+    with metrics.stage('fuzzy_match'):
+        matcher = get_fuzzy_matcher()
+        fuzzy = np.array([matcher.scores(text) for text in texts], dtype=np.float32).reshape(len(texts), -1)
+    intensity = np.array([s['intensity'] for s in sentiments], dtype=np.float32)[:, np.newaxis]
+    overall = (
+        CONFIDENCE_WEIGHTS['semantic'] * semantic +
+        CONFIDENCE_WEIGHTS['fuzzy'] * fuzzy +
+        CONFIDENCE_WEIGHTS['sentiment'] * intensity
+    )
+    return semantic, fuzzy, intensity, overall
+
+@metrics.timed('symptom_scoring')
+def score_symptoms_batch(texts, sentiments=None, batch_size=None, embeddings=None):
+    """Score many messages against every symptom at once.
+
+    All messages are encoded in one ``encode`` call (unless ``embeddings`` are
+    given) and the message x symptom confidence matrix is computed with NumPy.
+    Returns one symptom -> confidence mapping per message, in input order.
+    """
+    for text in texts:
+        if not text or not isinstance(text, str):
+            raise ValueError("Input text must be a non-empty string")
+    if not texts:
+        return []
+    index = get_symptom_index()
+    if sentiments is None:
+        sentiments = [analyze_sentiment(text) for text in texts]
+    if embeddings is None:
+        embeddings = encode_texts(texts, batch_size=batch_size)
+    semantic, fuzzy, intensity, overall = confidence_matrices(texts, sentiments, embeddings)
+
+    return [
+        {
+            symptom: {
+                'overall_confidence': float(overall[row, col]),
+                'semantic_similarity': float(semantic[row, col]),
+                'fuzzy_match': float(fuzzy[row, col]),
+                'sentiment_intensity': float(intensity[row, 0])
+            }
+            for col, symptom in enumerate(index.symptoms)
+        }
+        for row in range(len(texts))
+    ]
+
+def score_long_text(text, pooling='max', top_k=3, batch_size=None, evidence_threshold=0.3):
+    """Score a document of any length by chunking it and pooling the chunk confidences.
+
+    The text is split into sentence-sized spans, all spans are encoded in one
+    batch and scored like separate messages, and each symptom's confidence is
+    pooled across spans (``max`` or mean of the ``top_k`` best, see
+    ``chunking.pool_scores``). The semantic, fuzzy and sentiment parts come
+    from the symptom's best span.
+
+    Returns ``(confidences, evidence, n_chunks)`` where ``evidence`` maps each
+    symptom whose pooled confidence exceeds ``evidence_threshold`` to its best
+    spans: ``{'start', 'end', 'text', 'confidence'}``, best first.
+    """
+    if not text or not isinstance(text, str) or not text.strip():
+        raise ValueError("Input text must be a non-empty string")
+    index = get_symptom_index()
+    spans = split_spans(text, config.CHUNK_MAX_CHARS, config.CHUNK_MIN_CHARS)
+    chunks = [text[start:end] for start, end in spans]
+    sentiments = [analyze_sentiment(chunk) for chunk in chunks]
+    semantic, fuzzy, intensity, overall = confidence_matrices(
+        chunks, sentiments, encode_texts(chunks, batch_size=batch_size)
+    )
+    pooled, best_chunks = pool_scores(overall, pooling, top_k)
+
+    confidences = {}
+    evidence = {}
+    for col, symptom in enumerate(index.symptoms):
+        best = best_chunks[col][0]
+        confidences[symptom] = {
+            'overall_confidence': float(pooled[col]),
+            'semantic_similarity': float(semantic[best, col]),
+            'fuzzy_match': float(fuzzy[best, col]),
+            'sentiment_intensity': float(intensity[best, 0])
+        }
+        if pooled[col] > evidence_threshold:
+            evidence[symptom] = [
+                {
+                    'start': spans[row][0],
+                    'end': spans[row][1],
+                    'text': chunks[row],
+                    'confidence': float(overall[row, col])
+                }
+                for row in best_chunks[col]
+            ]
+    return confidences, evidence, len(chunks)
 # 🔹 Smart Sentence Splitting (Handles Input Without Punctuation)
+@metrics.timed('smart_split')
 def smart_split(user_input):
     """Splits user input into meaningful parts without punctuation."""
-    doc = nlp(user_input)  # Assuming nlp is already initialized (e.g., spaCy or similar NLP tool)
+    doc = get_spacy()(user_input)  # spaCy pipeline, loaded on first use (e.g., spaCy or similar NLP tool)
     phrases = []
     current_phrase = []
 
@@ -483,134 +920,139 @@ def smart_split(user_input):
 
     return phrases
 # 🔹 Preprocessing Function
+def _load_preprocessor():
+    ensure_nltk_resource('punkt')
+    ensure_nltk_resource('stopwords')
+    return TextPreprocessor(
+        word_tokenize,
+        stopwords.words("english"),
+        Speller(lang='en'),
+        spell_cache_size=config.SPELL_CACHE_SIZE
+    )
+
+preprocessor_component = components.register('preprocessor', _load_preprocessor)
+
+def get_preprocessor():
+    """Return the shared text preprocessing pipeline."""
+    return preprocessor_component.get()
+
+@metrics.timed('preprocess')
 def preprocess_text(user_input):
     """Cleans user input before extracting symptoms."""
-    user_input = emoji.demojize(user_input)  # Convert emojis to text (e.g., ":smile:" for 😀)
-    user_input = user_input.lower()  # Convert to lowercase
-    user_input = user_input.translate(str.maketrans('', '', string.punctuation))  # Remove punctuation
-    tokens = word_tokenize(user_input)  # Tokenize text into individual words
-    stop_words = set(stopwords.words("english")) - set(["and", "but", "also", "then", "so", "because", "or", "even", ",", "?", "!", "."])# List of stopwords (e.g., "and", "the", etc.)
-    tokens = [word for word in tokens if word not in stop_words]  # Remove stopwords
-    spell = Speller(lang='en')  # Initialize spell checker 
-    tokens = [spell(word) for word in tokens]  # Correct spelling of tokens
-    return " ".join(tokens)  # Return cleaned and tokenized text as a single string
+    return get_preprocessor().process(user_input)
+
+def preprocess_texts(texts):
+    """Clean many texts with the shared preprocessing pipeline."""
+    return get_preprocessor().process_many(texts)
+def _load_expression_index():
+    return ExpressionIndex.build(symptom_expressions, preprocess_texts)
+
+expression_index_component = components.register('expression_index', _load_expression_index)
+
+def get_expression_index():
+    """Return the inverted index over preprocessed symptom expressions."""
+    return expression_index_component.get()
+# Custom synonyms per symptom, on top of the WordNet lemmas
+CUSTOM_SYMPTOM_SYNONYMS = {
+    "fatigue": ["exhausted", "tired", "drained", "weary","sorrow", "grief", "misery", "heartache", "blue", "melancholy", "downhearted"],
+    "panic attacks": ["anxiety attacks", "nervous breakdown", "freak-out"],
+    "sadness": ["sorrow", "grief", "misery", "heartache","sad","blue", "melancholy", "downhearted","unhappy","depressed", "down", "gloomy"],
+    "loss of interest": ["apathy", "indifference", "disinterest", "unconcern", "boredom"],
+    "sleep disturbance": ["insomnia", "restlessness", "sleeplessness", "nocturnal", "disruption"],
+    "hopelessness": ["despair", "pessimism", "dejection", "discouragement", "misery"],
+    "changes in appetite": ["anorexia", "overeating", "under-eating", "cravings", "loss of appetite"],
+    "excessive worry": ["anxiety", "concern", "apprehension", "unease", "fear"],
+    "restlessness": ["agitation", "unease", "fidgeting", "nervousness", "disquiet"],
+    "rapid heartbeat": ["palpitations", "tachycardia", "pulsing", "throbbing", "fluttering"],
+    "shortness of breath": ["dyspnea", "breathlessness", "suffocation", "gasping", "wheezing", "hyperventilation"],
+    "sweating": ["perspiration", "moisture", "clamminess", "dripping", "dampness"],
+    "mood swings": ["fluctuations", "shifts", "instability", "variability", "changes", "oscillations"],
+    "manic episodes": ["euphoria", "hyperactivity", "elation", "excitement", "frenzy", "freneticism"],
+    "depressive episodes": ["doldrums", "low", "despondency", "melancholy", "blue", "gloom", "dejection"],
+    "impulsivity": ["rashness", "recklessness", "haste", "spontaneity", "impetuosity"],
+    "irritability": ["agitation", "annoyance", "frustration", "vexation", "exasperation"],
+    "hallucinations": ["illusions", "delusions", "visions", "misperceptions", "fancies"],
+    "delusions": ["misbelief", "falsehood", "fantasy", "illusion", "misconception", "hallucination"],
+    "disorganized speech": ["incoherence", "babbling", "confusion", "jargon", "gibberish", "muddling"],
+    "cognitive impairment": ["dysfunction", "deficit", "loss", "deterioration", "confusion"],
+    "social withdrawal": ["isolation", "seclusion", "aloneness", "reticence", "solitude", "loneliness"],
+    "flashbacks": ["recollections", "memories", "reminders", "replays", "reveries", "visions"],
+    "nightmares": ["bad dreams", "phantasms"],
+    "severe anxiety": ["terror", "panic", "fear", "dread", "alarm", "apprehension"],
+    "hypervigilance": ["alertness", "watchfulness", "surveillance", "attention", "caution", "guardedness"],
+    "avoidance behaviors": ["evasion", "withdrawal", "disengagement", "isolation"],
+    "obsessive thoughts": ["preoccupations", "intrusions", "worries", "ruminations", "fixations"],
+    "compulsive behavior": ["rituals", "obsessions", "acts", "habits", "addictions"],
+    "anxiety": ["nervousness", "apprehension", "tension", "worry", "unease", "stress"],
+    "fear of contamination": ["miasmophobia", "dirtiness", "germophobia", "cleanliness obsession"],
+    "need for order": ["tidiness", "neatness", "organization", "systematization", "precision"],
+    "inattention": ["neglect", "carelessness", "distraction", "absence", "unfocus", "lapse"],
+    "hyperactivity": ["restlessness", "agitation", "fidgeting", "excitable", "overactivity"],
+    "difficulty focusing": ["distractibility", "absence", "unfocused", "neglect", "inattention"],
+    "forgetfulness": ["absent-mindedness", "memory loss", "negligence", "obliviousness"],
+    "extreme dieting": ["starvation", "restriction", "fasting", "undereating", "self-control"],
+    "binge eating": ["overindulgence", "gluttony", "excess", "gorging", "overconsumption"],
+    "fear of weight gain": ["obesophobia", "fat phobia", "weight anxiety", "thin obsession"],
+    "distorted body image": ["dysmorphia", "misperception", "self-image issues", "body dissatisfaction"],
+    "emotional instability": ["moodiness", "volatility", "variability", "impulsiveness", "unpredictability"],
+    "fear of abandonment": ["separation anxiety", "rejection fear", "loneliness", "isolation"],
+    "impulsive behavior": ["rashness", "recklessness", "haste", "spontaneity", "instinctiveness"],
+    "self-harm": ["self-injury", "cutting", "wounding", "self-mutilation", "destructive behavior"],
+    "difficulty falling asleep": ["restlessness", "wakefulness", "sleeplessness", "tossing", "turning"],
+    "frequent night wakings": ["interruptions", "waking", "disruptions", "awakenings", "rousing"],
+    "daytime fatigue": ["exhaustion", "tiredness", "weariness", "drowsiness", "lethargy"]
+}
+
 # Function to get symptom synonyms
 def get_symptom_variants(symptom):
     """Generates synonyms for a symptom using WordNet and custom mappings."""
     synonyms = {symptom.lower()}  # Start with the symptom itself
+    ensure_nltk_resource('wordnet')
 
     for syn in wordnet.synsets(symptom):  # Look for synonyms in WordNet
         for lemma in syn.lemmas():
             synonyms.add(lemma.name().replace("_", " ").lower())  # Add the synonyms to the set
 
-    # Add custom synonyms for specific symptomsu78i
-    if symptom.lower() == "fatigue":
-        synonyms.update(["exhausted", "tired", "drained", "weary","sorrow", "grief", "misery", "heartache", "blue", "melancholy", "downhearted"])
-    elif symptom.lower() == "panic attacks":
-        synonyms.update(["anxiety attacks", "nervous breakdown", "freak-out"])
-    elif symptom.lower() == "sadness":
-        synonyms.update(["sorrow", "grief", "misery", "heartache","sad","blue", "melancholy", "downhearted","unhappy","depressed", "down", "gloomy"])
-    elif symptom.lower() == "loss of interest":
-        synonyms.update(["apathy", "indifference", "disinterest", "unconcern", "boredom"])
-    elif symptom.lower() == "sleep disturbance":
-        synonyms.update(["insomnia", "restlessness", "sleeplessness", "nocturnal", "disruption"])
-    elif symptom.lower() == "hopelessness":
-        synonyms.update(["despair", "pessimism", "dejection", "discouragement", "misery"])
-    elif symptom.lower() == "changes in appetite":
-        synonyms.update(["anorexia", "overeating", "under-eating", "cravings", "loss of appetite"])
-    elif symptom.lower() == "excessive worry":
-        synonyms.update(["anxiety", "concern", "apprehension", "unease", "fear"])
-    elif symptom.lower() == "restlessness":
-        synonyms.update(["agitation", "unease", "fidgeting", "nervousness", "disquiet"])
-    elif symptom.lower() == "panic attacks":
-        synonyms.update(["terror", "dread", "alarm", "fright", "fear", "apprehension", "shock"])
-    elif symptom.lower() == "rapid heartbeat":
-        synonyms.update(["palpitations", "tachycardia", "pulsing", "throbbing", "fluttering"])
-    elif symptom.lower() == "shortness of breath":
-        synonyms.update(["dyspnea", "breathlessness", "suffocation", "gasping", "wheezing", "hyperventilation"])
-    elif symptom.lower() == "sweating":
-        synonyms.update(["perspiration", "moisture", "clamminess", "dripping", "dampness"])
-    elif symptom.lower() == "mood swings":
-        synonyms.update(["fluctuations", "shifts", "instability", "variability", "changes", "oscillations"])
-    elif symptom.lower() == "manic episodes":
-        synonyms.update(["euphoria", "hyperactivity", "elation", "excitement", "frenzy", "freneticism"])
-    elif symptom.lower() == "depressive episodes":
-        synonyms.update(["doldrums", "low", "despondency", "melancholy", "blue", "gloom", "dejection"])
-    elif symptom.lower() == "impulsivity":
-        synonyms.update(["rashness", "recklessness", "haste", "spontaneity", "impetuosity"])
-    elif symptom.lower() == "irritability":
-        synonyms.update(["agitation", "annoyance", "frustration", "vexation", "exasperation"])
-    elif symptom.lower() == "hallucinations":
-        synonyms.update(["illusions", "delusions", "visions", "misperceptions", "fancies"])
-    elif symptom.lower() == "delusions":
-        synonyms.update(["misbelief", "falsehood", "fantasy", "illusion", "misconception", "hallucination"])
-    elif symptom.lower() == "disorganized speech":
-        synonyms.update(["incoherence", "babbling", "confusion", "jargon", "gibberish", "muddling"])
-    elif symptom.lower() == "cognitive impairment":
-        synonyms.update(["dysfunction", "deficit", "loss", "deterioration", "confusion"])
-    elif symptom.lower() == "social withdrawal":
-        synonyms.update(["isolation", "seclusion", "aloneness", "reticence", "solitude", "loneliness"])
-    elif symptom.lower() == "flashbacks":
-        synonyms.update(["recollections", "memories", "reminders", "replays", "reveries", "visions"])
-    elif symptom.lower() == "nightmares":
-        synonyms.update(["bad dreams", "phantasms"])
-
-    elif symptom.lower() == "severe anxiety":
-        synonyms.update(["terror", "panic", "fear", "dread", "alarm", "apprehension"])
-    elif symptom.lower() == "hypervigilance":
-        synonyms.update(["alertness", "watchfulness", "surveillance", "attention", "caution", "guardedness"])
-    elif symptom.lower() == "avoidance behaviors":
-        synonyms.update(["evasion", "withdrawal", "disengagement", "isolation"])
-    elif symptom.lower() == "obsessive thoughts":
-        synonyms.update(["preoccupations", "intrusions", "worries", "ruminations", "fixations"])
-    elif symptom.lower() == "compulsive behavior":
-        synonyms.update(["rituals", "obsessions", "acts", "habits", "addictions"])
-    elif symptom.lower() == "anxiety":
-        synonyms.update(["nervousness", "apprehension", "tension", "worry", "unease", "stress"])
-    elif symptom.lower() == "fear of contamination":
-        synonyms.update(["miasmophobia", "dirtiness", "germophobia", "cleanliness obsession"])
-    elif symptom.lower() == "need for order":
-        synonyms.update(["tidiness", "neatness", "organization", "systematization", "precision"])
-    elif symptom.lower() == "inattention":
-        synonyms.update(["neglect", "carelessness", "distraction", "absence", "unfocus", "lapse"])
-    elif symptom.lower() == "hyperactivity":
-        synonyms.update(["restlessness", "agitation", "fidgeting", "excitable", "overactivity"])
-    elif symptom.lower() == "impulsivity":
-        synonyms.update(["impetuosity", "rashness", "spontaneity", "instinctiveness", "haste"])
-    elif symptom.lower() == "difficulty focusing":
-        synonyms.update(["distractibility", "absence", "unfocused", "neglect", "inattention"])
-    elif symptom.lower() == "forgetfulness":
-        synonyms.update(["absent-mindedness", "memory loss", "negligence", "obliviousness"])
-    elif symptom.lower() == "extreme dieting":
-        synonyms.update(["starvation", "restriction", "fasting", "undereating", "self-control"])
-    elif symptom.lower() == "binge eating":
-        synonyms.update(["overindulgence", "gluttony", "excess", "gorging", "overconsumption"])
-    elif symptom.lower() == "fear of weight gain":
-        synonyms.update(["obesophobia", "fat phobia", "weight anxiety", "thin obsession"])
-    elif symptom.lower() == "distorted body image":
-        synonyms.update(["dysmorphia", "misperception", "self-image issues", "body dissatisfaction"])
-    elif symptom.lower() == "emotional instability":
-        synonyms.update(["moodiness", "volatility", "variability", "impulsiveness", "unpredictability"])
-    elif symptom.lower() == "fear of abandonment":
-        synonyms.update(["separation anxiety", "rejection fear", "loneliness", "isolation"])
-    elif symptom.lower() == "impulsive behavior":
-        synonyms.update(["rashness", "recklessness", "haste", "spontaneity", "instinctiveness"])
-    elif symptom.lower() == "self-harm":
-        synonyms.update(["self-injury", "cutting", "wounding", "self-mutilation", "destructive behavior"])
-    elif symptom.lower() == "difficulty falling asleep":
-        synonyms.update(["restlessness", "wakefulness", "sleeplessness", "tossing", "turning"])
-    elif symptom.lower() == "frequent night wakings":
-        synonyms.update(["interruptions", "waking", "disruptions", "awakenings", "rousing"])
-    elif symptom.lower() == "daytime fatigue":
-        synonyms.update(["exhaustion", "tiredness", "weariness", "drowsiness", "lethargy"])
-    elif symptom.lower() == "irritability":
-        synonyms.update(["agitation", "annoyance", "frustration", "exasperation", "moodiness"])
-
-    return synonyms 
-def extract_symptoms(user_input, symptoms_list):
+    # Knowledge-graph symptoms use underscores ("loss_of_interest")
+    synonyms.update(CUSTOM_SYMPTOM_SYNONYMS.get(symptom.lower().replace("_", " "), []))
+
+    return synonyms
+
+def catalogue_symptoms():
+    """All symptoms referenced by the disorder catalogue, in first-seen order."""
+    return list(dict.fromkeys(symptom for symptoms in disorders.values() for symptom in symptoms))
+
+def _load_symptom_lexicon():
+    symptoms = catalogue_symptoms()
+    fingerprint = lexicon_fingerprint(symptoms, CUSTOM_SYMPTOM_SYNONYMS)
+    path = config.SYMPTOM_LEXICON_PATH
+    if path and os.path.exists(path):
+        try:
+            lexicon = SymptomLexicon.load(path)
+            if lexicon.fingerprint == fingerprint:
+                return lexicon
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load symptom lexicon from {path}: {e}")
+
+    # Needs WordNet; run build_assets.py ahead of time to keep it off the request path
+    lexicon = SymptomLexicon.build(symptoms, get_symptom_variants, fingerprint)
+    if path:
+        try:
+            lexicon.save(path)
+        except OSError as e:
+            print(f"Could not save symptom lexicon to {path}: {e}")
+    return lexicon
+
+symptom_lexicon_component = components.register('symptom_lexicon', _load_symptom_lexicon)
+
+def get_symptom_lexicon():
+    """Return the compiled symptom-variant lexicon."""
+    return symptom_lexicon_component.get()
+@metrics.timed('extract_symptoms')
+def extract_symptoms(user_input, symptoms_list, context=None):
     phrases = smart_split(user_input)
     detected_symptoms = set()
-    processed_input = preprocess_text(user_input)
+    processed_input = context.processed_text if context is not None else preprocess_text(user_input)
     words = processed_input.split()
 
     # Add contextual pattern matching
@@ -626,44 +1068,45 @@ def extract_symptoms(user_input, symptoms_list):
         if any(pattern in processed_input for pattern in patterns):
             context_score += 0.2  # Increase confidence based on context
 
-    # Existing symptom matching logic
-    for phrase in phrases:
-        for symptom, expressions in symptom_expressions.items():
-            for expression in expressions:
-                processed_phrase = preprocess_text(phrase).split()
-                processed_expression = preprocess_text(expression).split()
-                common_words = set(processed_phrase).intersection(set(processed_expression))
-                
-                # Add confidence scoring based on context
-                if len(common_words) >= 2:
-                    confidence = (len(common_words) / len(processed_expression)) + context_score
-                    if confidence > 0.5:  # Adjusted threshold
-                        detected_symptoms.add(symptom)
+    # Existing symptom matching logic, via the pre-tokenized expression index
+    expression_index = get_expression_index()
+    for processed in preprocess_texts(phrases):
+        detected_symptoms |= expression_index.match(processed.split(), context_score)
 
+    # Variant matching: one automaton pass over the raw and the cleaned text
+    lexicon = get_symptom_lexicon()
+    variant_hits = lexicon.match(user_input, processed_input)
     for symptom in symptoms_list:
         if symptom not in detected_symptoms:
-            variants = set(w.lower() for w in get_symptom_variants(symptom))
-            if any(word.lower() in variants for word in words):
-                detected_symptoms.add(symptom)
-
+            if symptom in lexicon:
+                if symptom in variant_hits:
+                    detected_symptoms.add(symptom)
+            else:
+                variants = set(w.lower() for w in get_symptom_variants(symptom))
+                if any(word.lower() in variants for word in words):
+                    detected_symptoms.add(symptom)
 
     return detected_symptoms
-def ask_about_symptom(symptom_name, symptom_data):
+def ask_about_symptom(symptom_name, symptom_data, lang='en'):
+    """Ask the follow-up questions of one symptom in ``lang``; True once two are answered yes."""
     yes_count = 0
     for i, question in enumerate(symptom_data["questions"]):
-        answer = input(f"Chatbot: {question} (yes/no)\nYou: ").strip().lower()
+        answer = input(f"Chatbot: {translate_text(question, lang)} (yes/no)\nYou: ").strip().lower()
         if "yes" in answer:
             yes_count += 1
             affirmation = symptom_data["affirmations"][min(i, len(symptom_data["affirmations"]) - 1)]
-            print("💬 Chatbot:", affirmation)
+            print("💬 Chatbot:", translate_text(affirmation, lang))
         if yes_count >= 2:
             print(f"✅ Symptom confirmed: {symptom_name}")
             return True
     return False
 # ✅ Extract all symptoms from the KG
-def get_all_symptoms_from_kg(kg):
-    """Retrieve all symptoms from the knowledge graph."""
-    return [str(symptom).split("#")[-1] for symptom in kg.subjects(RDF.type, ex.Symptom)]
+def get_all_symptoms_from_kg(kg=None):
+    """Retrieve all symptoms from the knowledge graph (the compiled snapshot by default)."""
+    if kg is None or isinstance(kg, KnowledgeGraphSnapshot):
+        return (kg or get_kg_snapshot()).nodes_of('symptom')
+    from rdflib import RDF
+    return [str(symptom).split("#")[-1] for symptom in kg.subjects(RDF.type, get_namespace().Symptom)]
 Anxiety = {
     "Excessive Worry": {
         "questions": [
@@ -707,18 +1150,12 @@ def demo_chat(lang='ar'):
     mini_chatbot(lang, demo_input=user_input)
 
 def mini_chatbot(lang='en', demo_input=None):
-    # Initial welcome messages with more variety
-    welcome_messages = [
-        "Hi there! I'm HeadDoWell, your mental wellness companion. How have you been feeling lately?",
-        "Hello! I'm HeadDoWell, and I'm here to listen and support you. How are you doing today?",
-        "Welcome! I'm HeadDoWell. This is a safe space to share whatever's on your mind. How have things been for you?"
-    ]
-    
-    print(random.choice(welcome_messages))
+    print(translate_text(random.choice(WELCOME_MESSAGES), lang))
     
     conversation_count = 0
-    confirmed_symptoms = []
-    user_responses = []
+    # Each response is analyzed as it arrives and folded into the running state
+    from conversation_state import ConversationState
+    state = ConversationState()
 
     while conversation_count < 3:  # Have at least 3 exchanges before analysis
         if demo_input and conversation_count == 0:
@@ -726,32 +1163,20 @@ def mini_chatbot(lang='en', demo_input=None):
         else:
             user_input = input("\nYou: ")
         
-        user_responses.append(user_input)
-        
-        # Supportive follow-up responses
-        follow_ups = [
-            "I hear you. Could you tell me more about that?",
-            "That sounds challenging. How long have you been feeling this way?",
-            "Thank you for sharing that. Would you like to elaborate?",
-            "I understand this isn't easy to talk about. What else is on your mind?"
-        ]
+        state.add_turn(user_input)
         
         if conversation_count < 2:
-            print(f"\nHeadDoWell: {random.choice(follow_ups)}")
+            print(f"\nHeadDoWell: {translate_text(random.choice(FOLLOW_UPS), lang)}")
         
         conversation_count += 1
 
-    # Process all responses together for better context
-    all_symptoms = get_all_symptoms_from_kg(g)
-    all_user_input = " ".join(user_responses)
-    detected = extract_symptoms(all_user_input, all_symptoms)
+    detected = state.detected
 
     # More natural symptom confirmation
     if detected:
         print("\n🤗 Thank you for sharing all of this with me. I notice some patterns in what you're sharing:")
         
-        # Calculate disorder confidence scores
-        disorder_scores = analyze_disorders(detected, user_responses)
+        disorder_scores = state.disorder_scores
         
         # Present findings more naturally
         for disorder, confidence in disorder_scores.items():
@@ -769,19 +1194,12 @@ def mini_chatbot(lang='en', demo_input=None):
         if not demo_input:
             choice = input("\nWhat feels right for you? (1-4): ")
             handle_user_choice(choice, disorder_scores)
-import nltk
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('wordnet') 
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('wordnet')
 def suggest_coping_strategies(disorder_scores):
     """Suggest personalized coping strategies based on detected disorders."""
     print("\nHeadDoWell: Let me share some strategies that might help:\n")
     
     for disorder, confidence in disorder_scores.items():
-        if disorder == "Depression":
+        if disorder_key(disorder) == "depression":
             print("🌱 For managing depressive symptoms:")
             print("• Establish a gentle daily routine")
             print("• Take small steps outside, even just for fresh air")
@@ -789,12 +1207,21 @@ def suggest_coping_strategies(disorder_scores):
             print("• Practice self-compassion - be kind to yourself")
             print("• Try to engage in art or activities you used to enjoy, even for just 5 minutes\n")
         
-        elif disorder == "Anxiety":
+        elif disorder_key(disorder) == "anxiety_disorder":
             print("🧘 For managing anxiety:")
             print("• Try deep breathing exercises (4-7-8 breathing)")
             print("• Ground yourself using the 5-4-3-2-1 technique")
             print("• Write down your worries to release them")
             print("• Create a calming playlist\n")
+
+        elif confidence > 30:
+            # Other disorders: therapies linked to them in the knowledge graph
+            profile = get_recommendation_index().profile(disorder)
+            if profile and profile['therapies']:
+                print(f"💡 Approaches that often help with {disorder.replace('_', ' ')}:")
+                for therapy in profile['therapies']:
+                    print(f"• {therapy['label']}")
+                print()
     
     print("Would you like to explore any of these strategies together? Or would you prefer to talk about something else?")
 
@@ -811,30 +1238,56 @@ def suggest_professional_support(disorder_scores):
     print("💡 Remember: Seeking help is a sign of strength, not weakness.\n")
     print("Would you like information about crisis helplines or local mental health resources?")
 
-def analyze_disorders(detected_symptoms, user_responses):
-    """Analyze detected symptoms to determine potential disorders."""
-    disorder_scores = {}
-    
+disorder_kernel_component = components.register('disorder_kernel', lambda: DisorderKernel.from_catalogue(disorders))
+
+def get_disorder_kernel():
+    """Return the symptom x disorder incidence kernel."""
+    return disorder_kernel_component.get()
+
+# Components derived from the symptom / disorder catalogues above
+CATALOGUE_COMPONENTS = ['symptom_index', 'fuzzy_matcher', 'phrase_index', 'expression_index', 'symptom_lexicon', 'disorder_kernel', 'knowledge_graph', 'kg_snapshot', 'recommendation_index']
+_catalogue_version = None
+_catalogue_listeners = []
+
+def catalogue_version():
+    """Short hash identifying the current symptom / disorder catalogue and scoring weights."""
+    global _catalogue_version
+    if _catalogue_version is None:
+        payload = json.dumps(
+            {'expressions': symptom_expressions, 'disorders': disorders, 'weights': CONFIDENCE_WEIGHTS},
+            sort_keys=True
+        )
+        _catalogue_version = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+    return _catalogue_version
+
+def on_catalogue_change(listener):
+    """Register a callback to run after ``invalidate_catalogue``."""
+    _catalogue_listeners.append(listener)
+
+def invalidate_catalogue():
+    """Call after editing the catalogues: rebuilds derived indexes and notifies listeners."""
+    global _catalogue_version
+    _catalogue_version = None
+    for name in CATALOGUE_COMPONENTS:
+        components.get_component(name).reset()
+    for listener in _catalogue_listeners:
+        listener()
+
+@metrics.timed('disorders')
+def analyze_disorders(detected_symptoms, user_responses, sentiment=None):
+    """Analyze detected symptoms to determine potential disorders.
+
+    ``sentiment`` is the analysis of the combined responses; it is computed
+    here when not supplied.
+    """
     # Combine all user responses for sentiment analysis
-    combined_text = " ".join(user_responses)
-    sentiment_data = analyze_sentiment(combined_text)
-    
-    for disorder, symptoms in disorders.items():
-        # Calculate how many symptoms match
-        matching_symptoms = set(symptoms).intersection(detected_symptoms)
-        if matching_symptoms:
-            # Base confidence score on percentage of matching symptoms
-            confidence = (len(matching_symptoms) / len(symptoms)) * 100
-            
-            # Adjust confidence based on sentiment intensity
-            confidence += sentiment_data['intensity'] * 20
-            
-            # Normalize confidence score
-            confidence = min(confidence, 100)
-            
-            disorder_scores[disorder] = confidence
-    
-    return disorder_scores
+    sentiment_data = sentiment if sentiment is not None else analyze_sentiment(" ".join(user_responses))
+
+    return get_disorder_kernel().score([detected_symptoms], [sentiment_data['intensity']])[0]
+
+def analyze_disorders_batch(detected_symptom_sets, sentiment_intensities):
+    """Score disorders for many messages at once with one sparse matrix product."""
+    return get_disorder_kernel().score(list(detected_symptom_sets), list(sentiment_intensities))
 
 def handle_user_choice(choice, disorder_scores):
     """Handle user's choice of how to proceed with the conversation."""
@@ -0,0 +1,39 @@
+import string
+from functools import lru_cache
+
+import emoji
+
+# Words smart_split treats as phrase boundaries; they are kept out of the stopword set.
+BOUNDARY_WORDS = ["and", "but", "also", "then", "so", "because", "or", "even", ",", "?", "!", "."]
+
+
+class TextPreprocessor:
+    """Reusable text cleaning pipeline: demojize, lowercase, strip punctuation,
+    tokenize, drop stopwords and spell-correct.
+
+    The speller, stopword set and punctuation table are created once, and spell
+    corrections are memoized per token in a bounded LRU cache.
+    """
+
+    def __init__(self, tokenize, stop_words, speller, spell_cache_size=50000):
+        self.tokenize = tokenize
+        self.stop_words = frozenset(stop_words) - frozenset(BOUNDARY_WORDS)
+        self._punctuation_table = str.maketrans('', '', string.punctuation)
+        self.correct = lru_cache(maxsize=spell_cache_size)(speller)
+
+    def tokens(self, text):
+        """Return the cleaned, spell-corrected tokens of ``text``."""
+        text = emoji.demojize(text)  # Convert emojis to text (e.g., ":smile:" for 😀)
+        text = text.lower().translate(self._punctuation_table)
+        return [self.correct(word) for word in self.tokenize(text) if word not in self.stop_words]
+
+    def process(self, text):
+        """Return the cleaned text as a single space-separated string."""
+        return " ".join(self.tokens(text))
+
+    def process_many(self, texts):
+        """Process many texts, sharing the spell-correction cache across them."""
+        return [self.process(text) for text in texts]
+
+    def cache_info(self):
+        return self.correct.cache_info()
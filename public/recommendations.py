@@ -0,0 +1,100 @@
+import re
+
+import numpy as np
+
+from disorder_kernel import DisorderKernel, symptom_key
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z])(?=[A-Z])")
+
+
+def disorder_key(name):
+    """Canonical disorder name: 'AnxietyDisorder', 'BorderlinePD' and 'anxiety_disorder' style names agree."""
+    return symptom_key(_CAMEL_BOUNDARY.sub("_", name.strip()))
+
+
+class RecommendationIndex:
+    """Precomputed disorder profiles and symptom lookups over the knowledge-graph snapshot.
+
+    The graph names disorders in two spellings (class nodes such as
+    ``AnxietyDisorder`` carry the therapies, ``anxiety_disorder`` nodes carry
+    symptoms and treatments); both are merged under :func:`disorder_key`.
+    """
+
+    def __init__(self, snapshot):
+        self.fingerprint = snapshot.fingerprint
+        self.kernel = DisorderKernel.build(
+            (disorder_key(disorder), symptom)
+            for disorder in snapshot.nodes_of('disorder')
+            for symptom in snapshot.neighbours('hasSymptom', disorder)
+        )
+
+        # Every node with an outgoing edge (or typed as a disorder), grouped by canonical name
+        names = {}
+        for node in snapshot.nodes_of('disorder') + snapshot.nodes:
+            if snapshot.has('disorder', node) or any(snapshot.neighbours(relation, node) for relation in ('hasTherapy', 'hasTreatment')):
+                names.setdefault(disorder_key(node), []).append(node)
+
+        self.profiles = {}
+        for disorder, aliases in names.items():
+            aliases = _unique(aliases)
+            self.profiles[disorder] = {
+                'disorder': disorder,
+                'symptoms': _unique(s for name in aliases for s in snapshot.neighbours('hasSymptom', name)),
+                'therapies': [
+                    {'therapy': therapy, 'label': snapshot.label(therapy)}
+                    for therapy in _unique(t for name in aliases for t in snapshot.neighbours('hasTherapy', name))
+                ],
+                'treatments': _unique(t for name in aliases for t in snapshot.neighbours('hasTreatment', name))
+            }
+
+    def disorders(self):
+        return list(self.profiles)
+
+    def profile(self, disorder):
+        """Symptoms, therapies and treatments of one disorder (any spelling), or None."""
+        return self.profiles.get(disorder_key(disorder))
+
+    def disorders_for_symptom(self, symptom):
+        """Disorders that list ``symptom`` (any spelling)."""
+        return self.kernel.disorders_for(symptom)
+
+    def recommend(self, symptoms, limit=5):
+        """Rank disorders by overlap with ``symptoms`` and aggregate their therapies and treatments.
+
+        Disorders are ordered by the number of matched symptoms, then by the
+        share of their symptoms that matched. Each therapy and treatment is
+        scored by the summed overlap of the ranked disorders that use it.
+        """
+        detected = {symptom_key(symptom) for symptom in symptoms}
+        counts = self.kernel.match_counts(self.kernel.detection_matrix([detected]))[0]
+        coverage = np.divide(counts, self.kernel.disorder_sizes, out=np.zeros_like(counts), where=self.kernel.disorder_sizes > 0)
+        ranked = [i for i in np.lexsort((-coverage, -counts)) if counts[i] > 0][:limit]
+
+        ranked_disorders = []
+        therapy_scores = {}
+        treatment_scores = {}
+        for i in ranked:
+            profile = self.profiles[self.kernel.disorders[i]]
+            overlap = int(counts[i])
+            ranked_disorders.append({
+                'disorder': profile['disorder'],
+                'overlap': overlap,
+                'coverage': float(coverage[i]),
+                'matched_symptoms': [symptom for symptom in profile['symptoms'] if symptom_key(symptom) in detected]
+            })
+            for therapy in profile['therapies']:
+                entry = therapy_scores.setdefault(therapy['therapy'], dict(therapy, score=0))
+                entry['score'] += overlap
+            for treatment in profile['treatments']:
+                entry = treatment_scores.setdefault(treatment, {'treatment': treatment, 'score': 0})
+                entry['score'] += overlap
+
+        return {
+            'disorders': ranked_disorders,
+            'therapies': sorted(therapy_scores.values(), key=lambda entry: -entry['score']),
+            'treatments': sorted(treatment_scores.values(), key=lambda entry: -entry['score'])
+        }
+
+
+def _unique(items):
+    return list(dict.fromkeys(items))
@@ -0,0 +1,253 @@
+"""Prefork server: load models once, then fork workers that share them.
+
+The parent process imports the API, loads every registered component
+(sentence model, VADER, spaCy, the knowledge graph and the precomputed
+indexes), freezes the garbage collector and only then forks the workers.
+Each worker runs uvicorn on the listening socket inherited from the parent
+and shares the parent's memory pages copy-on-write, so model weights and
+index arrays are held once per host instead of once per worker.
+``gc.freeze()`` keeps the collector from writing to those objects in the
+workers and unsharing their pages.
+
+The parent restarts workers that exit, forwards SIGTERM/SIGINT, and logs
+each worker's unique (USS) and proportional (PSS) memory, read from
+``/proc/<pid>/smaps_rollup``. Linux only::
+
+    HDW_SESSIONS=0 python serve.py --workers 8 --port 8000
+
+Each worker keeps its own in-memory state, and the kernel hands every
+connection to whichever worker accepts it first:
+
+- Conversation sessions cannot follow a client from worker to worker, so
+  more than one worker is refused unless sessions are disabled
+  (``HDW_SESSIONS=0``).
+- ``/catalogue/invalidate`` invalidates the worker that served it, which
+  then sends SIGUSR1 to the parent; the parent passes it on to every other
+  worker, and they invalidate within a fraction of a second. The parent
+  then reloads its own copy, so workers restarted later fork from the
+  current catalogue. ``kill -USR1 <parent pid>`` invalidates all workers.
+- ``/metrics`` and ``/stats/*`` describe the one worker that answered. Every
+  metric carries a ``worker`` label (the worker slot) so samples from
+  different workers stay separate series; a scrape still reaches only one
+  worker.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+import config
+
+
+def process_memory(pid):
+    """RSS, PSS and USS (private pages) of a process in MiB, from /proc."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        return None
+    return {
+        'rss_mb': fields.get('Rss', 0) / 1024,
+        'pss_mb': fields.get('Pss', 0) / 1024,
+        'uss_mb': (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024
+    }
+
+
+def report_memory(workers):
+    parent = process_memory(os.getpid())
+    if parent is not None:
+        print(f"parent {os.getpid()}: rss {parent['rss_mb']:.0f} MiB, uss {parent['uss_mb']:.0f} MiB")
+    total_pss = parent['pss_mb'] if parent else 0.0
+    total_rss = parent['rss_mb'] if parent else 0.0
+    for slot, pid in sorted(workers.items()):
+        usage = process_memory(pid)
+        if usage is None:
+            continue
+        total_pss += usage['pss_mb']
+        total_rss += usage['rss_mb']
+        print(f"worker {slot} ({pid}): uss {usage['uss_mb']:.0f} MiB, pss {usage['pss_mb']:.0f} MiB, rss {usage['rss_mb']:.0f} MiB")
+    # Summed PSS is the real footprint; summed RSS is what unshared workers would use
+    print(f"total pss {total_pss:.0f} MiB (rss of all processes summed: {total_rss:.0f} MiB)")
+
+
+def preload(names=None):
+    """Import the API and load its components in this (parent) process."""
+    import api
+    import components
+
+    started = time.perf_counter()
+    components.warmup(names)
+    failed = [name for name, status in components.component_status().items() if status['state'] == 'failed']
+    print(f"Preloaded components in {time.perf_counter() - started:.1f}s" + (f" (failed: {', '.join(failed)})" if failed else ""))
+    return api.app
+
+
+def refresh_catalogue():
+    """Invalidate the parent's catalogue and reload what was loaded, so restarted workers fork from the new one."""
+    import components
+    import nlp
+
+    loaded = [name for name in nlp.CATALOGUE_COMPONENTS if components.get_component(name).loaded]
+    started = time.perf_counter()
+    try:
+        nlp.invalidate_catalogue()
+    except Exception as e:
+        print(f"Error invalidating catalogue in parent: {e}")
+    if loaded:
+        components.warmup(loaded)
+    gc.collect()
+    gc.freeze()
+    print(f"Reloaded catalogue in parent in {time.perf_counter() - started:.1f}s")
+
+
+def bind_socket(host, port, backlog=2048):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def invalidate_catalogue():
+    import nlp
+
+    try:
+        nlp.invalidate_catalogue()
+    except Exception as e:
+        print(f"Error invalidating catalogue in worker {os.getpid()}: {e}")
+
+
+def on_invalidate_signal(_signum, _frame):
+    # Handlers run on the event loop thread between bytecodes; rebuild elsewhere
+    threading.Thread(target=invalidate_catalogue, name='catalogue-invalidate', daemon=True).start()
+
+
+def run_worker(app, sock, torch_threads, slot):
+    """Worker body: serve the preloaded app on the inherited socket until told to stop."""
+    import uvicorn
+    import api
+    import metrics
+
+    # Restore default handlers; uvicorn installs its own graceful-shutdown handlers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # SIGUSR1 from the parent: another worker invalidated the catalogue
+    signal.signal(signal.SIGUSR1, on_invalidate_signal)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGUSR1})
+    api.notify_workers = lambda: os.kill(os.getppid(), signal.SIGUSR1)
+    metrics.registry.const_labels = {'worker': str(slot)}
+    if torch_threads and 'torch' in sys.modules:
+        # Workers share the cores; a full-size intra-op pool per worker oversubscribes them
+        sys.modules['torch'].set_num_threads(torch_threads)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=config.SERVE_LOG_LEVEL))
+    server.run(sockets=[sock])
+
+
+def spawn(app, sock, torch_threads, slot):
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            run_worker(app, sock, torch_threads, slot)
+            code = 0
+        except Exception as e:
+            print(f"Worker {os.getpid()} failed: {e}")
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=config.SERVE_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVE_PORT)
+    parser.add_argument('--workers', type=int, default=config.SERVE_WORKERS)
+    parser.add_argument('--preload', nargs='*', default=None, help='components to load before forking (default: all)')
+    parser.add_argument('--memory-report-interval', type=float, default=config.SERVE_MEMORY_REPORT_INTERVAL,
+                        help='seconds between memory reports, 0 to report only once after startup')
+    args = parser.parse_args(argv)
+
+    workers_count = max(1, args.workers)
+    if workers_count > 1 and config.SESSIONS_ENABLED:
+        parser.error(
+            "conversation sessions are kept in each worker's memory, so a session created on one worker "
+            "is unknown to the others; run one worker or disable sessions with HDW_SESSIONS=0"
+        )
+    torch_threads = config.SERVE_TORCH_THREADS or max(1, (os.cpu_count() or 1) // workers_count)
+
+    app = preload(args.preload)
+    sock = bind_socket(args.host, args.port)
+    # Move everything loaded so far out of the collector's reach before forking
+    gc.collect()
+    gc.freeze()
+
+    # Held pending until the loop below collects it with sigtimedwait; workers unblock it
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGUSR1})
+    workers = {slot: spawn(app, sock, torch_threads, slot) for slot in range(workers_count)}
+    started = {slot: time.monotonic() for slot in workers}
+    print(f"Serving on {args.host}:{args.port} with {workers_count} workers (parent {os.getpid()})")
+
+    stopping = []
+
+    def stop(signum, _frame):
+        stopping.append(signum)
+        for pid in workers.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # First report once the workers have started, then periodically
+    next_report = time.monotonic() + 5.0
+    while workers:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            slot = next((slot for slot, worker in workers.items() if worker == pid), None)
+            if slot is not None:
+                del workers[slot]
+                if not stopping:
+                    code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+                    print(f"Worker {slot} ({pid}) exited with status {code}; restarting")
+                    # Do not spin when a worker dies right after starting
+                    if time.monotonic() - started[slot] < 1.0:
+                        time.sleep(1.0)
+                    workers[slot] = spawn(app, sock, torch_threads, slot)
+                    started[slot] = time.monotonic()
+            continue
+        if next_report is not None and time.monotonic() >= next_report and not stopping:
+            report_memory(workers)
+            interval = args.memory_report_interval
+            next_report = time.monotonic() + interval if interval > 0 else None
+        # Wait for a catalogue invalidation instead of sleeping, and pass it on to the other workers
+        info = signal.sigtimedwait({signal.SIGUSR1}, 0.2)
+        if info is not None and not stopping:
+            for pid in workers.values():
+                if pid != info.si_pid:
+                    try:
+                        os.kill(pid, signal.SIGUSR1)
+                    except ProcessLookupError:
+                        pass
+            refresh_catalogue()
+
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
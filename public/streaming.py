@@ -0,0 +1,84 @@
+import json
+
+from starlette.responses import StreamingResponse
+
+
+class LineTooLongError(ValueError):
+    """An NDJSON line exceeded the configured maximum size and was skipped."""
+
+
+async def iter_ndjson(chunks, max_line_bytes=65536):
+    """Parse an async stream of byte chunks as NDJSON, one line at a time.
+
+    Yields ``(line_number, value)`` for every non-blank line, where ``value``
+    is the decoded JSON or the exception raised for that line
+    (``LineTooLongError`` or ``ValueError``). Oversized lines are discarded
+    while they are read, so memory stays bounded by ``max_line_bytes``.
+    """
+    buffer = bytearray()
+    line_number = 0
+    skipping = False
+
+    def decode(raw):
+        try:
+            return json.loads(raw.decode('utf-8'))
+        except ValueError as e:
+            return ValueError(f"Invalid JSON: {e}")
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b'\n', start)
+            if end == -1:
+                if not skipping:
+                    buffer += chunk[start:]
+                    if len(buffer) > max_line_bytes:
+                        buffer.clear()
+                        skipping = True
+                break
+
+            line_number += 1
+            if skipping:
+                skipping = False
+                yield line_number, LineTooLongError(f"Line exceeds {max_line_bytes} bytes")
+            else:
+                buffer += chunk[start:end]
+                if len(buffer) > max_line_bytes:
+                    yield line_number, LineTooLongError(f"Line exceeds {max_line_bytes} bytes")
+                elif buffer.strip():
+                    yield line_number, decode(bytes(buffer))
+            buffer.clear()
+            start = end + 1
+
+    if skipping or buffer.strip():
+        line_number += 1
+        if skipping:
+            yield line_number, LineTooLongError(f"Line exceeds {max_line_bytes} bytes")
+        else:
+            yield line_number, decode(bytes(buffer))
+
+
+def ndjson_line(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """Streams NDJSON lines while the request body is still being read.
+
+    Newer Starlette versions watch ``receive`` for a disconnect while
+    streaming, which would swallow request body chunks that the generator
+    itself still has to read; this response only sends. A client disconnect
+    surfaces as ``ClientDisconnect`` from ``request.stream()`` instead.
+    Each ``send`` waits for the server's write buffer to drain, so a slow
+    reader slows down how fast the request body is consumed.
+    """
+
+    media_type = 'application/x-ndjson'
+
+    async def __call__(self, scope, receive, send):
+        await send({'type': 'http.response.start', 'status': self.status_code, 'headers': self.raw_headers})
+        async for chunk in self.body_iterator:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        if self.background is not None:
+            await self.background()
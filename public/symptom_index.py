@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from atomic_file import atomic_write
+
+# Bump when the on-disk layout changes so stale index files are rebuilt.
+INDEX_FORMAT_VERSION = 1
+
+
+def catalogue_fingerprint(symptom_expressions, model_name):
+    """Hash the expression catalogue and model name to detect stale indexes."""
+    payload = json.dumps(
+        {'format': INDEX_FORMAT_VERSION, 'model': model_name, 'expressions': symptom_expressions},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def normalize_rows(matrix):
+    """L2-normalise each row of a matrix (a 1-D vector is treated as one row)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SymptomIndex:
+    """Normalised embeddings for every symptom expression plus one centroid per symptom.
+
+    Expression rows are stored grouped by symptom, in catalogue order, so
+    ``offsets[i]:offsets[i + 1]`` is the slice of rows belonging to
+    ``symptoms[i]``.
+    """
+
+    def __init__(self, symptoms, symptom_texts, expressions, offsets, expression_vectors, centroids, fingerprint):
+        self.symptoms = list(symptoms)
+        self.symptom_texts = list(symptom_texts)
+        self.expressions = list(expressions)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.expression_vectors = np.asarray(expression_vectors, dtype=np.float32)
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, symptom_expressions, encode, model_name):
+        """Encode every expression once and derive the per-symptom centroids.
+
+        ``encode`` takes a list of strings and returns one embedding row per string.
+        """
+        symptoms = list(symptom_expressions)
+        expressions = []
+        offsets = [0]
+        for symptom in symptoms:
+            expressions.extend(symptom_expressions[symptom])
+            offsets.append(len(expressions))
+
+        expression_vectors = normalize_rows(encode(expressions))
+        centroids = normalize_rows(np.stack([
+            expression_vectors[offsets[i]:offsets[i + 1]].mean(axis=0)
+            for i in range(len(symptoms))
+        ]))
+        symptom_texts = [" ".join(symptom_expressions[symptom]).lower() for symptom in symptoms]
+
+        return cls(
+            symptoms, symptom_texts, expressions, offsets, expression_vectors, centroids,
+            catalogue_fingerprint(symptom_expressions, model_name)
+        )
+
+    def save(self, path):
+        """Write the index to a compressed ``.npz`` file."""
+        with atomic_write(path) as f:
+            np.savez_compressed(
+                f,
+                symptoms=np.array(self.symptoms),
+                symptom_texts=np.array(self.symptom_texts),
+                expressions=np.array(self.expressions),
+                offsets=self.offsets,
+                expression_vectors=self.expression_vectors,
+                centroids=self.centroids,
+                fingerprint=np.array(self.fingerprint)
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by :meth:`save`."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data['symptoms'].tolist(),
+                data['symptom_texts'].tolist(),
+                data['expressions'].tolist(),
+                data['offsets'],
+                data['expression_vectors'],
+                data['centroids'],
+                str(data['fingerprint'])
+            )
+
+    def expression_symptom(self, expression_id):
+        """Name of the symptom that expression row ``expression_id`` belongs to."""
+        return self.symptoms[int(np.searchsorted(self.offsets, expression_id, side='right')) - 1]
+
+    def semantic_scores(self, message_vectors):
+        """Cosine similarity of each message against each symptom centroid.
+
+        Returns an array of shape ``(n_messages, n_symptoms)``.
+        """
+        return normalize_rows(message_vectors) @ self.centroids.T
+
+    def expression_scores(self, message_vectors):
+        """Cosine similarity of each message against each individual expression."""
+        return normalize_rows(message_vectors) @ self.expression_vectors.T
+
+    def best_expression_scores(self, message_vectors):
+        """Best-matching expression similarity per symptom, shape ``(n_messages, n_symptoms)``."""
+        return np.maximum.reduceat(self.expression_scores(message_vectors), self.offsets[:-1], axis=1)
+
+
+def load_or_build(symptom_expressions, encode, model_name, path=None):
+    """Load the index from ``path`` if it matches the catalogue, otherwise build and save it."""
+    fingerprint = catalogue_fingerprint(symptom_expressions, model_name)
+    if path and os.path.exists(path):
+        try:
+            index = SymptomIndex.load(path)
+            if index.fingerprint == fingerprint:
+                return index
+        except Exception as e:
+            print(f"Could not load symptom index from {path}: {e}")
+
+    index = SymptomIndex.build(symptom_expressions, encode, model_name)
+    if path:
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"Could not save symptom index to {path}: {e}")
+    return index
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import re
+from collections import deque
+
+from atomic_file import atomic_write
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+# Bump when the on-disk layout changes so stale lexicons are rebuilt.
+LEXICON_FORMAT_VERSION = 1
+
+
+def normalize_for_matching(text):
+    """Lowercase, turn punctuation and underscores into spaces and collapse whitespace."""
+    text = _NON_WORD.sub(" ", text.lower()).replace("_", " ")
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class AhoCorasick:
+    """Multi-pattern matcher that finds every pattern occurrence in one linear pass.
+
+    Patterns only match on whole words: a hit must start and end at a word
+    boundary of the (normalised) text.
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            self._add(pattern, pattern_id)
+        self.patterns = list(patterns)
+        self._link()
+
+    def _add(self, pattern, pattern_id):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(pattern_id)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text):
+        """Yield ``(start, end, pattern_id)`` for every whole-word match in ``text``."""
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern_id in self._output[state]:
+                end = position + 1
+                start = end - len(self.patterns[pattern_id])
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    yield start, end, pattern_id
+
+
+def lexicon_fingerprint(symptoms, custom_synonyms):
+    payload = json.dumps(
+        {'format': LEXICON_FORMAT_VERSION, 'symptoms': sorted(symptoms), 'custom': custom_synonyms},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SymptomLexicon:
+    """Every known variant of every symptom, compiled into one Aho-Corasick automaton."""
+
+    def __init__(self, variants, fingerprint=None):
+        self.variants = {symptom: sorted(words) for symptom, words in variants.items()}
+        self.fingerprint = fingerprint
+        pattern_symptoms = {}
+        for symptom, words in self.variants.items():
+            for word in words:
+                pattern = normalize_for_matching(word)
+                if pattern:
+                    pattern_symptoms.setdefault(pattern, set()).add(symptom)
+        self._patterns = list(pattern_symptoms)
+        self._pattern_symptoms = [pattern_symptoms[pattern] for pattern in self._patterns]
+        self._automaton = AhoCorasick(self._patterns)
+
+    @classmethod
+    def build(cls, symptoms, get_variants, fingerprint=None):
+        """Collect the variants of each symptom with ``get_variants(symptom)``."""
+        return cls({symptom: get_variants(symptom) for symptom in symptoms}, fingerprint)
+
+    def __contains__(self, symptom):
+        return symptom in self.variants
+
+    def find(self, text):
+        """Return ``(symptom, variant, start, end)`` for every variant found in ``text``."""
+        text = normalize_for_matching(text)
+        return [
+            (symptom, self._patterns[pattern_id], start, end)
+            for start, end, pattern_id in self._automaton.find_all(text)
+            for symptom in self._pattern_symptoms[pattern_id]
+        ]
+
+    def match(self, *texts):
+        """Symptoms with at least one variant present in any of ``texts``."""
+        return {symptom for text in texts for symptom, _, _, _ in self.find(text)}
+
+    def save(self, path):
+        with atomic_write(path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'variants': self.variants}, f, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['variants'], data.get('fingerprint'))
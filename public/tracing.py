@@ -0,0 +1,146 @@
+"""Per-request stage traces and an on-demand sampling profiler.
+
+A trace is started for one request (see ``api.analyze_message``) and
+collects every pipeline stage timed through ``metrics.timed`` /
+``metrics.stage`` plus counters such as encode calls and symptoms scored.
+The active trace lives in a context variable, so only the traced request
+pays for recording; other requests see ``None`` and skip it.
+
+:class:`SamplingProfiler` periodically snapshots the stacks of all threads
+and returns them in the collapsed format read by ``flamegraph.pl`` and
+speedscope (``frame;frame;frame count`` per line).
+"""
+import contextvars
+import ipaddress
+import os
+import sys
+import threading
+import time
+
+_active_trace = contextvars.ContextVar('hdw_trace', default=None)
+
+
+class RequestTrace:
+    """Stage timings and counters of one traced request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self.counters = {}
+
+    def record(self, name, started, elapsed):
+        self.stages.append((name, started - self.started, elapsed))
+
+    def add(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def summary(self):
+        """Stages in start order (offsets from the start of the request), per-stage totals and counters."""
+        stages = sorted(self.stages, key=lambda stage: stage[1])
+        totals = {}
+        for name, _, elapsed in stages:
+            entry = totals.setdefault(name, {'calls': 0, 'total_ms': 0.0})
+            entry['calls'] += 1
+            entry['total_ms'] += elapsed * 1000
+        return {
+            'total_ms': (time.perf_counter() - self.started) * 1000,
+            'stages': [{'stage': name, 'start_ms': offset * 1000, 'duration_ms': elapsed * 1000} for name, offset, elapsed in stages],
+            'stage_totals': totals,
+            'counters': dict(self.counters)
+        }
+
+
+def start_trace():
+    """Start tracing the current context; returns the trace and a token for :func:`end_trace`."""
+    trace = RequestTrace()
+    return trace, _active_trace.set(trace)
+
+
+def end_trace(token):
+    _active_trace.reset(token)
+
+
+def record(name, started, elapsed):
+    """Add a finished stage to the active trace, if any."""
+    trace = _active_trace.get()
+    if trace is not None:
+        trace.record(name, started, elapsed)
+
+
+def add(counter, amount=1):
+    """Increment a counter of the active trace, if any."""
+    trace = _active_trace.get()
+    if trace is not None:
+        trace.add(counter, amount)
+
+
+def parse_networks(value):
+    """Comma-separated addresses or CIDR ranges, e.g. ``127.0.0.1,10.0.0.0/8``."""
+    networks = []
+    for entry in value.split(','):
+        entry = entry.strip()
+        if entry:
+            try:
+                networks.append(ipaddress.ip_network(entry, strict=False))
+            except ValueError as e:
+                print(f"Ignoring invalid trusted network '{entry}': {e}")
+    return networks
+
+
+def is_trusted(host, networks):
+    """Whether the client address ``host`` falls in one of ``networks``."""
+    try:
+        address = ipaddress.ip_address(host)
+    except (TypeError, ValueError):
+        return False
+    return any(address in network for network in networks)
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of every other thread at a fixed interval.
+
+    Sampling only reads ``sys._current_frames()``, so the profiled threads
+    run unmodified; the cost is one stack walk per thread per interval.
+    Only one profile runs at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._lock.locked()
+
+    def profile(self, seconds, interval=0.01):
+        """Sample for ``seconds``; returns ``{collapsed stack: samples}``, or None if a profile is already running."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            own = threading.get_ident()
+            counts = {}
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_name(frame.f_code))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, f"thread-{ident}"))
+                    key = ";".join(reversed(stack))
+                    counts[key] = counts.get(key, 0) + 1
+                time.sleep(interval)
+            return counts
+        finally:
+            self._lock.release()
+
+
+def collapsed_stacks(counts):
+    """Render sample counts as collapsed-stack lines, most frequent first."""
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items(), key=lambda item: -item[1]))
@@ -0,0 +1,274 @@
+"""Offline-first translation of user-facing text.
+
+Lookups go, in order, through the pre-translated catalogue built by
+``build_assets.py translations``, a persistent bounded SQLite cache and
+finally the configured backend. The default ``identity`` backend is a local
+stand-in that returns the English text unchanged, so nothing on the request
+path depends on an external service. ``marian`` runs local MarianMT models
+and ``googletrans`` is only meant for building the catalogue online.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from atomic_file import atomic_write
+
+
+class IdentityBackend:
+    """Local stand-in: leaves text untranslated."""
+
+    name = 'identity'
+
+    def translate_many(self, texts, target_lang, source_lang='en'):
+        return list(texts)
+
+
+class MarianBackend:
+    """Local MarianMT models (``Helsinki-NLP/opus-mt-<src>-<tgt>``), loaded once per language pair."""
+
+    name = 'marian'
+
+    def __init__(self, cache_folder=None, model_pattern='Helsinki-NLP/opus-mt-{source}-{target}'):
+        self.cache_folder = cache_folder
+        self.model_pattern = model_pattern
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, source_lang, target_lang):
+        key = (source_lang, target_lang)
+        with self._lock:
+            if key not in self._models:
+                from transformers import MarianMTModel, MarianTokenizer
+                name = self.model_pattern.format(source=source_lang, target=target_lang)
+                self._models[key] = (
+                    MarianTokenizer.from_pretrained(name, cache_dir=self.cache_folder),
+                    MarianMTModel.from_pretrained(name, cache_dir=self.cache_folder)
+                )
+            return self._models[key]
+
+    def translate_many(self, texts, target_lang, source_lang='en'):
+        tokenizer, model = self._model(source_lang, target_lang)
+        inputs = tokenizer(list(texts), return_tensors='pt', padding=True, truncation=True)
+        outputs = model.generate(**inputs)
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+
+class GoogleTransBackend:
+    """Online Google Translate client; use it to build the catalogue, not to serve requests."""
+
+    name = 'googletrans'
+
+    def __init__(self):
+        from googletrans import Translator
+        self.translator = Translator()
+
+    def translate_many(self, texts, target_lang, source_lang='en'):
+        return [self.translator.translate(text, src=source_lang, dest=target_lang).text for text in texts]
+
+
+TRANSLATION_BACKENDS = {
+    IdentityBackend.name: IdentityBackend,
+    MarianBackend.name: MarianBackend,
+    GoogleTransBackend.name: GoogleTransBackend
+}
+
+
+def create_backend(name, **options):
+    """Instantiate a translation backend by name."""
+    if name not in TRANSLATION_BACKENDS:
+        raise ValueError(f"Unknown translation backend '{name}'. Choose from: {', '.join(TRANSLATION_BACKENDS)}")
+    if name == MarianBackend.name:
+        return MarianBackend(**options)
+    return TRANSLATION_BACKENDS[name]()
+
+
+# Recency bookkeeping of the cache, batched as in embedding_store: a hit only
+# refreshes entries last used more than TOUCH_AFTER seconds ago, and
+# refreshes are written together once TOUCH_BATCH are queued or
+# TOUCH_FLUSH_SECONDS have passed
+TOUCH_AFTER = 600.0
+TOUCH_BATCH = 256
+TOUCH_FLUSH_SECONDS = 30.0
+
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()
+
+
+class TranslationCache:
+    """Persistent translation cache in SQLite, bounded to ``max_entries`` rows.
+
+    Entries are keyed by backend, language pair and the SHA-256 of the source
+    text. Every ``prune_every`` inserts (1% of the cap by default) the least
+    recently used rows past ``max_entries`` are dropped.
+    """
+
+    def __init__(self, path, max_entries=50000, prune_every=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_every = prune_every or max(1, max_entries // 100)
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._bookkeeping_lock = threading.Lock()
+        self._touched = set()
+        self._touch_flushed_at = time.monotonic()
+        self._inserts = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "backend TEXT NOT NULL, source_lang TEXT NOT NULL, target_lang TEXT NOT NULL, "
+                "text_hash BLOB NOT NULL, translation TEXT NOT NULL, used_at REAL NOT NULL, "
+                "PRIMARY KEY (backend, source_lang, target_lang, text_hash)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS translations_used_at ON translations (used_at)")
+
+    def _connection(self):
+        # One connection per thread and process; sqlite3 connections are not
+        # thread-safe and must not be used across a fork (see serve.py)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, backend, text, target_lang, source_lang='en'):
+        key = (backend, source_lang, target_lang, _text_hash(text))
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT translation, used_at FROM translations "
+            "WHERE backend = ? AND source_lang = ? AND target_lang = ? AND text_hash = ?",
+            key
+        ).fetchone()
+        with self._stats_lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        self._touch(conn, [key] if row[1] < time.time() - TOUCH_AFTER else [])
+        return row[0]
+
+    def _touch(self, conn, keys):
+        """Queue recency refreshes and write them in one transaction when a batch is due."""
+        with self._bookkeeping_lock:
+            self._touched.update(keys)
+            due = self._touched and (
+                len(self._touched) >= TOUCH_BATCH or time.monotonic() - self._touch_flushed_at >= TOUCH_FLUSH_SECONDS
+            )
+            if not due:
+                return
+            touched, self._touched = self._touched, set()
+            self._touch_flushed_at = time.monotonic()
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "UPDATE translations SET used_at = ? "
+                "WHERE backend = ? AND source_lang = ? AND target_lang = ? AND text_hash = ?",
+                [(now, *key) for key in touched]
+            )
+
+    def put(self, backend, text, translation, target_lang, source_lang='en'):
+        conn = self._connection()
+        with self._bookkeeping_lock:
+            self._inserts += 1
+            prune = self._inserts >= self.prune_every
+            if prune:
+                self._inserts = 0
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO translations "
+                "(backend, source_lang, target_lang, text_hash, translation, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (backend, source_lang, target_lang, _text_hash(text), translation, time.time())
+            )
+            if prune:
+                excess = conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    conn.execute(
+                        "DELETE FROM translations WHERE (backend, source_lang, target_lang, text_hash) IN "
+                        "(SELECT backend, source_lang, target_lang, text_hash FROM translations ORDER BY used_at LIMIT ?)",
+                        (excess,)
+                    )
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def load_catalogue(path):
+    """Read ``{target_lang: {english_text: translation}}`` written by :func:`build_catalogue`."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_catalogue(texts, languages, backend, seed=None):
+    """Translate every catalogue string into every language.
+
+    ``seed`` holds hand-written translations (same layout as the result) that
+    take precedence over the backend.
+    """
+    texts = list(dict.fromkeys(texts))
+    catalogue = {}
+    for lang in languages:
+        if lang == 'en':
+            continue
+        known = dict((seed or {}).get(lang, {}))
+        missing = [text for text in texts if text not in known]
+        if missing:
+            known.update(zip(missing, backend.translate_many(missing, lang)))
+        catalogue[lang] = {text: known[text] for text in texts if text in known}
+    return catalogue
+
+
+def save_catalogue(catalogue, path):
+    with atomic_write(path, 'w', encoding='utf-8') as f:
+        json.dump(catalogue, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+
+class TranslationService:
+    """Catalogue first, then the persistent cache, then the backend; never raises."""
+
+    def __init__(self, backend, cache=None, catalogue=None, source_lang='en'):
+        self.backend = backend
+        self.cache = cache
+        self.catalogue = catalogue or {}
+        self.source_lang = source_lang
+
+    def translate(self, text, target_lang):
+        if not text or target_lang == self.source_lang:
+            return text
+        translated = self.catalogue.get(target_lang, {}).get(text)
+        if translated is not None:
+            return translated
+        if self.cache is not None:
+            translated = self.cache.get(self.backend.name, text, target_lang, self.source_lang)
+            if translated is not None:
+                return translated
+        try:
+            translated = self.backend.translate_many([text], target_lang, self.source_lang)[0]
+        except Exception as e:
+            print(f"Translation error: {e}")
+            return text
+        if self.cache is not None and self.backend.name != IdentityBackend.name:
+            self.cache.put(self.backend.name, text, translated, target_lang, self.source_lang)
+        return translated
@@ -0,0 +1,268 @@
+"""Vector indexes for top-k retrieval over a large phrase bank.
+
+``FlatIndex`` is an exact inner-product scan. ``IVFIndex`` is an inverted-file
+index: vectors are clustered with spherical k-means and a query only scans
+the ``n_probe`` clusters whose centroids are closest to it. Both expect
+L2-normalised vectors, so inner product equals cosine similarity.
+
+Measure IVF recall and latency against the exact scan with::
+
+    python vector_index.py benchmark --vectors 50000 --queries 200
+"""
+import argparse
+import sys
+import threading
+import time
+
+import numpy as np
+
+from atomic_file import atomic_write
+from symptom_index import normalize_rows
+
+
+def _top_k(scores, ids, k):
+    """Top ``k`` (score, id) pairs per row of ``scores``, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.float32), np.zeros((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    best = np.take_along_axis(part, order, axis=1)
+    return np.take_along_axis(scores, best, axis=1), ids[best]
+
+
+def _save(path, **arrays):
+    with atomic_write(path) as f:
+        np.savez(f, **arrays)
+
+
+class FlatIndex:
+    """Exact top-k search by scanning every stored vector."""
+
+    kind = 'flat'
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, vectors, ids=None):
+        """Append vectors; ``ids`` default to consecutive integers after the current size."""
+        vectors = normalize_rows(vectors)
+        ids = np.arange(len(self), len(self) + len(vectors)) if ids is None else np.asarray(ids, dtype=np.int64)
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.ids = np.concatenate([self.ids, ids])
+
+    def search(self, queries, k):
+        """Return ``(scores, ids)``, each of shape ``(n_queries, k)``, best match first."""
+        return _top_k(normalize_rows(queries) @ self.vectors.T, self.ids, k)
+
+    def save(self, path):
+        _save(path, kind=np.array(self.kind), vectors=self.vectors, ids=self.ids)
+
+    @classmethod
+    def _from_arrays(cls, data):
+        index = cls(data['vectors'].shape[1])
+        index.vectors = data['vectors']
+        index.ids = data['ids']
+        return index
+
+
+class IVFIndex:
+    """Approximate top-k search over k-means clusters (inverted file)."""
+
+    kind = 'ivf'
+
+    def __init__(self, dim, n_lists=None, n_probe=8):
+        self.dim = dim
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.centroids = None
+        self._list_vectors = []
+        self._list_ids = []
+        self._pending = []
+        # Searches run on several executor threads and each may flush pending adds
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(ids) for ids in self._list_ids) + sum(len(ids) for _, ids in self._pending)
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def train(self, vectors, iterations=10, seed=0):
+        """Fit ``n_lists`` centroids with spherical k-means (defaults to about sqrt(n))."""
+        vectors = normalize_rows(vectors)
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(len(vectors)))), len(vectors))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            # Re-seed empty clusters with random vectors so every list stays useful
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+            centroids = normalize_rows(sums)
+        self.n_lists = n_lists
+        self.centroids = centroids
+        self._list_vectors = [np.zeros((0, self.dim), dtype=np.float32) for _ in range(n_lists)]
+        self._list_ids = [np.zeros(0, dtype=np.int64) for _ in range(n_lists)]
+
+    def add(self, vectors, ids=None):
+        """Assign vectors to their nearest cluster; trains on the first non-empty batch if needed."""
+        vectors = normalize_rows(vectors)
+        if not len(vectors):
+            return
+        with self._lock:
+            ids = np.arange(len(self), len(self) + len(vectors)) if ids is None else np.asarray(ids, dtype=np.int64)
+            if not self.is_trained:
+                self.train(vectors)
+            self._pending.append((vectors, ids))
+
+    def _flush(self):
+        # Incremental adds are buffered and merged into the lists on the next search
+        if not self._pending:
+            return
+        with self._lock:
+            if not self._pending:
+                return
+            vectors = np.concatenate([v for v, _ in self._pending])
+            ids = np.concatenate([i for _, i in self._pending])
+            self._pending = []
+            assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+            for list_id in np.unique(assignment):
+                members = assignment == list_id
+                self._list_vectors[list_id] = np.concatenate([self._list_vectors[list_id], vectors[members]])
+                self._list_ids[list_id] = np.concatenate([self._list_ids[list_id], ids[members]])
+
+    def search(self, queries, k, n_probe=None):
+        """Return ``(scores, ids)`` of shape ``(n_queries, k)``; missing hits have id -1."""
+        self._flush()
+        queries = normalize_rows(queries)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        result_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if not self.is_trained:
+            return scores, result_ids
+
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :n_probe]
+        for row, query in enumerate(queries):
+            candidate_vectors = np.concatenate([self._list_vectors[p] for p in probes[row]])
+            candidate_ids = np.concatenate([self._list_ids[p] for p in probes[row]])
+            if len(candidate_ids):
+                top_scores, top_ids = _top_k((candidate_vectors @ query)[np.newaxis, :], candidate_ids, k)
+                scores[row, :top_scores.shape[1]] = top_scores[0]
+                result_ids[row, :top_ids.shape[1]] = top_ids[0]
+        return scores, result_ids
+
+    def save(self, path):
+        """Write the index; an untrained (empty) index is stored as zero-length arrays."""
+        self._flush()
+        offsets = np.cumsum([0] + [len(ids) for ids in self._list_ids])
+        _save(
+            path,
+            kind=np.array(self.kind),
+            n_probe=np.array(self.n_probe),
+            centroids=self.centroids if self.is_trained else np.zeros((0, self.dim), dtype=np.float32),
+            offsets=offsets,
+            vectors=np.concatenate(self._list_vectors) if self._list_vectors else np.zeros((0, self.dim), dtype=np.float32),
+            ids=np.concatenate(self._list_ids) if self._list_ids else np.zeros(0, dtype=np.int64)
+        )
+
+    @classmethod
+    def _from_arrays(cls, data):
+        centroids = data['centroids']
+        index = cls(centroids.shape[1], n_lists=len(centroids) or None, n_probe=int(data['n_probe']))
+        if not len(centroids):
+            return index
+        index.centroids = centroids
+        offsets = data['offsets']
+        index._list_vectors = [data['vectors'][offsets[i]:offsets[i + 1]] for i in range(len(centroids))]
+        index._list_ids = [data['ids'][offsets[i]:offsets[i + 1]] for i in range(len(centroids))]
+        return index
+
+
+INDEX_TYPES = {FlatIndex.kind: FlatIndex, IVFIndex.kind: IVFIndex}
+
+
+def build_index(kind, vectors, ids=None, **params):
+    """Create an index of the given kind and add ``vectors`` to it."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    index = INDEX_TYPES[kind](vectors.shape[1], **params)
+    index.add(vectors, ids)
+    return index
+
+
+def load_index(path):
+    """Load an index written by ``save``, whatever its kind."""
+    with np.load(path, allow_pickle=False) as data:
+        return INDEX_TYPES[str(data['kind'])]._from_arrays(data)
+
+
+def benchmark(index, exact, queries, k=10):
+    """Recall@k of ``index`` against the exact ``FlatIndex`` and per-query latency of both."""
+    def timed(search):
+        latencies = []
+        results = []
+        for query in queries:
+            started = time.perf_counter()
+            results.append(search(query[np.newaxis, :], k)[1][0])
+            latencies.append(time.perf_counter() - started)
+        return np.array(results), np.array(latencies) * 1000.0
+
+    exact_ids, exact_ms = timed(exact.search)
+    approx_ids, approx_ms = timed(index.search)
+    recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx_ids, exact_ids)])
+    return {
+        'kind': index.kind,
+        'vectors': len(exact),
+        'queries': len(queries),
+        'k': k,
+        'recall_at_k': float(recall),
+        'exact_p50_ms': float(np.percentile(exact_ms, 50)),
+        'exact_p95_ms': float(np.percentile(exact_ms, 95)),
+        'approx_p50_ms': float(np.percentile(approx_ms, 50)),
+        'approx_p95_ms': float(np.percentile(approx_ms, 95))
+    }
+
+
+def _synthetic_vectors(n, dim, clusters, rng):
+    centers = normalize_rows(rng.normal(size=(clusters, dim)))
+    return normalize_rows(centers[rng.integers(0, clusters, n)] + 0.7 * rng.normal(size=(n, dim)) / np.sqrt(dim))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    bench = commands.add_parser('benchmark', help='compare IVF recall and latency with the exact scan')
+    bench.add_argument('--vectors', type=int, default=50000)
+    bench.add_argument('--queries', type=int, default=200)
+    bench.add_argument('--dim', type=int, default=384)
+    bench.add_argument('--k', type=int, default=10)
+    bench.add_argument('--lists', type=int, default=None)
+    bench.add_argument('--probe', type=int, nargs='+', default=[4, 8, 16, 32])
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    vectors = _synthetic_vectors(args.vectors, args.dim, max(10, args.vectors // 200), rng)
+    queries = _synthetic_vectors(args.queries, args.dim, max(10, args.vectors // 200), rng)
+    exact = build_index('flat', vectors)
+    started = time.perf_counter()
+    ivf = build_index('ivf', vectors, n_lists=args.lists)
+    ivf.search(queries[:1], args.k)
+    print(f"Built IVF index with {ivf.n_lists} lists in {time.perf_counter() - started:.1f}s")
+    for n_probe in args.probe:
+        ivf.n_probe = n_probe
+        report = benchmark(ivf, exact, queries, args.k)
+        print(f"n_probe={n_probe}: " + ", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}" for key, value in report.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))